@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import exceptions, serializers, status
+
+from recipes.images import ImageProcessingTimeout, run_in_pool
+
+
+class ImageProcessingUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = ('Изображение не удалось обработать, '
+                      'повторите запрос позже.')
+    default_code = 'image_processing_timeout'
+
+
+@contextmanager
+def image_processing():
+    """ Тайм-аут обработки изображения отдается клиенту как 503,
+    а не как ошибка сервера. """
+    try:
+        yield
+    except ImageProcessingTimeout:
+        raise ImageProcessingUnavailable()
+
+
+class RecipeImageField(Base64ImageField):
+    """ Фото рецепта: base64-строка или файл из multipart/form-data.
+    Декодирование выполняется в ограниченном пуле потоков.
+    Файлу в обоих случаях дается случайное имя, имя файла клиента
+    не сохраняется. При заданном variant отдается ссылка
+    на уменьшенную копию, если она уже создана. """
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        with image_processing():
+            if hasattr(data, 'read'):
+                return run_in_pool(self.file_to_internal_value, data)
+            return run_in_pool(super().to_internal_value, data)
+
+    def file_to_internal_value(self, data):
+        image_file = serializers.ImageField.to_internal_value(self, data)
+        extension = image_file.image.format.lower()
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        image_file.name = f'{self.get_file_name(image_file)}.{extension}'
+        return image_file
+
+    def get_attribute(self, instance):
+        image = super().get_attribute(instance)
+        if self.variant:
+            return getattr(instance, f'image_{self.variant}', None) or image
+        return image
@@ -0,0 +1,55 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.cache_versions import (INGREDIENTS_VERSION, RECIPE_VERSION,
+                                    TAGS_VERSION, USER_VERSION, get_versions)
+
+# Номер в префиксе меняется вместе с составом полей фрагмента,
+# чтобы не отдавать записи, сохраненные прежним кодом.
+FRAGMENT_KEY_PREFIX = 'recipe_fragment:2'
+
+
+def get_fragment_keys(recipes, request=None, image_variant=None,
+                      fields=None):
+    """ Ключи кеша представлений рецептов.
+    Ключ зависит от версий рецепта, его автора, справочников тегов
+    и ингредиентов, а также от адреса сервера, размера в ссылке
+    на фото и набора полей ответа. """
+    base_url = request.build_absolute_uri('/') if request else ''
+    version_keys = [(TAGS_VERSION,), (INGREDIENTS_VERSION,)]
+    for recipe in recipes:
+        version_keys.append((RECIPE_VERSION, recipe.pk))
+        version_keys.append((USER_VERSION, recipe.author_id))
+    tags_version, ingredients_version, *versions = get_versions(
+        *version_keys)
+
+    keys = {}
+    for index, recipe in enumerate(recipes):
+        source = '|'.join((
+            base_url, image_variant or '', ','.join(sorted(fields or ())),
+            tags_version, ingredients_version,
+            *versions[2 * index:2 * index + 2]
+        )).encode('utf-8')
+        keys[recipe.pk] = '{}:{}:{}'.format(
+            FRAGMENT_KEY_PREFIX, recipe.pk,
+            md5(source, usedforsecurity=False).hexdigest())
+    return keys
+
+
+def get_fragments(keys):
+    """ Закешированные представления: id рецепта -> данные. """
+    cached = cache.get_many(keys.values())
+    return {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+
+
+def set_fragments(keys, fragments):
+    """ Сохраняет представления рецептов в кеш. """
+    cache.set_many(
+        {keys[recipe_id]: data for recipe_id, data in fragments.items()},
+        settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+    )
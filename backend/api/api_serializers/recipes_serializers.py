@@ -1,31 +1,48 @@
-from drf_extra_fields.fields import Base64ImageField
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
 from users.models import CustomUser, AuthorSubscription
+from api.middleware import SerializerTimingMixin, serializer_timer
+from api.api_serializers import fragment_cache
+from api.api_serializers.fields import RecipeImageField, image_processing
+from api.api_serializers.sparse_fields import SparseFieldsMixin
 from api.api_serializers.users_serializers import CustomUserSerializer
-from recipes.models import (Tag, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart)
+from recipes import images, shopping_list
+from recipes.signals import recipe_ingredients_changed
+from recipes.models import (Tag, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, get_recipe_prefetches)
 
 AMOUNT_MIN = 1
 AMOUNT_MAX = 32000
+BULK_RECIPES_MAX = 100
+# Поля рецепта, зависящие от текущего пользователя.
+VIEWER_FIELDS = frozenset(('is_favorited', 'is_in_shopping_cart', 'author'))
+COUNTER_FIELDS = ('favorites_count', 'in_carts_count')
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     """ Сериализатор для тегов. """
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     """ Сериализатор для ингредиентов. """
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(SerializerTimingMixin,
+                            serializers.ModelSerializer):
     """ Сериализатор для компактного отображения рецептов. """
+    image = RecipeImageField(read_only=True, variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -40,6 +57,14 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         fields = ('subscriber', 'author')
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """ Список id рецептов для пакетных операций. """
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_MAX)
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """ Сериализатор для ингредиентов рецепта. """
     id = serializers.ReadOnlyField(source='ingredient.id')
@@ -79,12 +104,21 @@ class SubscriptionShowSerializer(CustomUserSerializer):
     recipes_count = serializers.SerializerMethodField()
 
     def get_recipes(self, obj):
-        author_recipes = obj.recipes.all()[:2]
-        return RecipeSerializer(
-            author_recipes, many=True
+        """ Рецепты автора, подгруженные во view, или выборка
+        с учетом recipes_limit. """
+        if hasattr(obj, 'limited_recipes'):
+            author_recipes = obj.limited_recipes
+        else:
+            author_recipes = Recipe.objects.latest_for_authors(
+                [obj], self.context.get(
+                    'recipes_limit', settings.SUBSCRIPTION_RECIPES_LIMIT))
+        return RecipeShortSerializer(
+            author_recipes, many=True, context=self.context
         ).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     class Meta:
@@ -93,9 +127,24 @@ class SubscriptionShowSerializer(CustomUserSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """ Сериализатор для рецептов. """
-    image = Base64ImageField()
+class RecipeListSerializer(serializers.ListSerializer):
+    """ Сериализует страницу рецептов одним проходом по кешу. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'image' in self.child.fields:
+            self.child.fields['image'].variant = 'medium'
+
+    def to_representation(self, data):
+        with serializer_timer():
+            return self.child.represent_many(list(data))
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """ Сериализатор для рецептов.
+    Общая для всех пользователей часть представления кешируется,
+    флаги текущего пользователя и счетчики накладываются поверх. """
+    image = RecipeImageField()
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True,
@@ -108,6 +157,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         """ Проверяет, добавлен ли рецепт в избанное. """
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (
             request is not None
@@ -118,6 +169,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj):
         """ Проверяет, добавлен ли
         рецепт в список покупок. """
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (
             request is not None
@@ -125,18 +178,100 @@ class RecipeSerializer(serializers.ModelSerializer):
             and request.user.shopping_user.filter(recipe=obj).exists()
         )
 
+    def get_viewer_flags(self, recipes):
+        """ Флаги избранного, корзины и подписки для каждого рецепта:
+        из аннотаций запроса или одной пачкой запросов. """
+        if all(hasattr(recipe, 'author_is_subscribed') for recipe in recipes):
+            return {
+                recipe.pk: (recipe.is_favorited, recipe.is_in_shopping_cart,
+                            recipe.author_is_subscribed)
+                for recipe in recipes
+            }
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return {recipe.pk: (False, False, False) for recipe in recipes}
+        user = request.user
+        recipe_ids = [recipe.pk for recipe in recipes]
+        favorited = set(user.favoriting.filter(
+            recipe__in=recipe_ids).values_list('recipe_id', flat=True))
+        in_cart = set(user.shopping_user.filter(
+            recipe__in=recipe_ids).values_list('recipe_id', flat=True))
+        subscribed = set(user.subscriber.filter(
+            author__in={recipe.author_id for recipe in recipes}
+        ).values_list('author_id', flat=True))
+        return {
+            recipe.pk: (recipe.pk in favorited, recipe.pk in in_cart,
+                        recipe.author_id in subscribed)
+            for recipe in recipes
+        }
+
+    def represent_many(self, recipes):
+        """ Представления рецептов: общая часть из кеша,
+        пропущенные сериализуются и кешируются. """
+        fields = self.fields
+        flags = (self.get_viewer_flags(recipes)
+                 if VIEWER_FIELDS.intersection(fields) else {})
+        image = fields.get('image')
+        keys = fragment_cache.get_fragment_keys(
+            recipes, self.context.get('request'),
+            image.variant if image else None, self.sparse_fields)
+        fragments = fragment_cache.get_fragments(keys)
+        missing = [recipe for recipe in recipes if recipe.pk not in fragments]
+        if missing:
+            prefetch_related_objects(missing, *get_recipe_prefetches(
+                {fields[name].source for name in ('tags', 'ingredients')
+                 if name in fields}))
+            for recipe in missing:
+                if not flags:
+                    continue
+                (recipe.is_favorited, recipe.is_in_shopping_cart,
+                 author_is_subscribed) = flags[recipe.pk]
+                if 'author' in fields:
+                    recipe.author.is_subscribed = author_is_subscribed
+            serialized = {
+                recipe.pk: super(RecipeSerializer, self).to_representation(
+                    recipe)
+                for recipe in missing
+            }
+            fragment_cache.set_fragments(keys, serialized)
+            fragments.update(serialized)
+
+        representations = []
+        for recipe in recipes:
+            data = fragments[recipe.pk]
+            if flags:
+                is_favorited, is_in_shopping_cart, author_is_subscribed = (
+                    flags[recipe.pk])
+                if 'is_favorited' in data:
+                    data['is_favorited'] = is_favorited
+                if 'is_in_shopping_cart' in data:
+                    data['is_in_shopping_cart'] = is_in_shopping_cart
+                if 'author' in data:
+                    data['author']['is_subscribed'] = author_is_subscribed
+            for name in COUNTER_FIELDS:
+                if name in fields:
+                    data[name] = getattr(recipe, name)
+            representations.append(data)
+        return representations
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return self.represent_many([instance])[0]
+
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time', 'pub_date'
+                  'image', 'text', 'cooking_time', 'pub_date',
+                  'favorites_count', 'in_carts_count'
                   )
+        list_serializer_class = RecipeListSerializer
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientCreateSerializer(many=True, required=True)
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField(required=False)
+    image = RecipeImageField(required=False)
     tags = serializers.PrimaryKeyRelatedField(many=True, required=True,
                                               queryset=Tag.objects.all())
 
@@ -158,37 +293,126 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         RecipeIngredient.objects.bulk_create(ingredients_to_create)
 
+    def to_internal_value(self, data):
+        """ Принимает multipart/form-data: теги передаются списком,
+        ингредиенты - JSON-строкой, фото - файлом. """
+        if hasattr(data, 'getlist'):
+            form_data = data.dict()
+            if 'tags' in data:
+                form_data['tags'] = data.getlist('tags')
+            if isinstance(form_data.get('ingredients'), str):
+                try:
+                    form_data['ingredients'] = json.loads(
+                        form_data['ingredients'])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {'ingredients': 'Ожидается список в формате JSON.'})
+            data = form_data
+        return super().to_internal_value(data)
+
+    @transaction.atomic
     def create(self, validated_data):
         """ Сохраняет теги и ингредиенты рецепта в базу данных. """
         author = self.context['request'].user
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
 
-        recipe = Recipe.objects.create(
+        recipe = Recipe(
             author=author,
             **validated_data
         )
+        if recipe.image:
+            with image_processing():
+                images.attach_variants(recipe)
+        recipe.save()
 
         self.create_recipe_ingredients(ingredients_data, recipe)
 
         recipe.tags.set(tags_data)
         return recipe
 
-    def update(self, instance, validated_data):
-        fields_to_update = ['image', 'name', 'text', 'cooking_time']
-        for field_name in fields_to_update:
-            new_value = validated_data.get(
-                field_name, getattr(instance, field_name))
-            setattr(instance, field_name, new_value)
-
-        tags_data = validated_data.get('tags')
-        instance.tags.set(tags_data)
-
-        ingredients_data = validated_data.get('ingredients')
-        instance.ingredients_list.all().delete()
-        self.create_recipe_ingredients(ingredients_data, instance)
+    def validate_ingredients(self, value):
+        ingredient_ids = [item['id'].pk for item in value]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.')
+        return value
 
-        instance.save()
+    @staticmethod
+    def update_recipe_ingredients(ingredients_data, recipe_instance):
+        """ Приводит ингредиенты рецепта к ingredients_data,
+        выполняя только необходимые вставки, обновления и удаления.
+        Возвращает изменения количества по ингредиентам. """
+        current = {}
+        to_delete = []
+        for recipe_ingredient in recipe_instance.ingredients_list.all():
+            if recipe_ingredient.ingredient_id in current:
+                to_delete.append(recipe_ingredient)
+            else:
+                current[recipe_ingredient.ingredient_id] = recipe_ingredient
+
+        deltas = Counter()
+        for recipe_ingredient in to_delete:
+            deltas[recipe_ingredient.ingredient_id] -= (
+                recipe_ingredient.amount)
+        to_create = []
+        to_update = []
+        for ingredient_data in ingredients_data:
+            ingredient = ingredient_data['id']
+            amount = ingredient_data['amount']
+            recipe_ingredient = current.pop(ingredient.pk, None)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredient(
+                    ingredient=ingredient, recipe=recipe_instance,
+                    amount=amount))
+                deltas[ingredient.pk] += amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient.pk] += amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_delete.extend(current.values())
+        for recipe_ingredient in current.values():
+            deltas[recipe_ingredient.ingredient_id] -= (
+                recipe_ingredient.amount)
+
+        if to_delete:
+            with shopping_list.applied_explicitly():
+                RecipeIngredient.objects.filter(
+                    pk__in=[item.pk for item in to_delete]).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        return deltas if to_delete or to_update or to_create else None
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        update_fields = []
+        for field_name in ('name', 'text', 'cooking_time'):
+            if field_name not in validated_data:
+                continue
+            new_value = validated_data[field_name]
+            if getattr(instance, field_name) != new_value:
+                setattr(instance, field_name, new_value)
+                update_fields.append(field_name)
+        if validated_data.get('image'):
+            instance.image = validated_data['image']
+            with image_processing():
+                images.attach_variants(instance)
+            update_fields.extend(('image', 'image_thumbnail', 'image_medium'))
+
+        if 'tags' in validated_data:
+            instance.tags.set(validated_data['tags'])
+
+        if 'ingredients' in validated_data:
+            deltas = self.update_recipe_ingredients(
+                validated_data['ingredients'], instance)
+            if deltas is not None:
+                shopping_list.recipe_amounts_changed(instance.pk, deltas)
+                recipe_ingredients_changed(instance.pk)
+
+        if update_fields:
+            instance.save(update_fields=update_fields)
 
         return instance
 
@@ -0,0 +1,55 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def get_param_names(request, param):
+    value = request.query_params.get(param, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_sparse_fields(request, available):
+    """ Поля ответа по ?fields= (только перечисленные) и ?omit=
+    (все, кроме перечисленных). Возвращает None, если ответ
+    не сокращается. Для запросов на изменение параметры
+    не учитываются. """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = get_param_names(request, FIELDS_PARAM)
+    omit = get_param_names(request, OMIT_PARAM)
+    if not fields and not omit:
+        return None
+    errors = {}
+    for param, names in ((FIELDS_PARAM, fields), (OMIT_PARAM, omit)):
+        unknown = names.difference(available)
+        if unknown:
+            errors[param] = 'Неизвестные поля: {}.'.format(
+                ', '.join(sorted(unknown)))
+    if errors:
+        raise serializers.ValidationError(errors)
+    return frozenset(
+        name for name in available
+        if (not fields or name in fields) and name not in omit)
+
+
+def get_model_columns(model, fields):
+    """ Столбцы модели, которые нужны полям ответа. """
+    columns = {field.name for field in model._meta.concrete_fields}
+    return [name for name in fields if name in columns]
+
+
+class SparseFieldsMixin:
+    """ Оставляет в сериализаторе только поля, запрошенные через
+    ?fields= и ?omit=. Вложенные сериализаторы не сокращаются. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = get_sparse_fields(
+            self.context.get('request'),
+            [name for name, field in self.fields.items()
+             if not field.write_only])
+        if self.sparse_fields is not None:
+            for name in set(self.fields) - self.sparse_fields:
+                self.fields.pop(name)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 
+from api.api_serializers.sparse_fields import SparseFieldsMixin
+from api.middleware import SerializerTimingMixin
 from users.models import CustomUser
 
 
@@ -19,7 +21,8 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SerializerTimingMixin, SparseFieldsMixin,
+                           UserSerializer):
     """ Сериализатор для пользовательской информации.
         Добавляет информацию о подписке пользователя.
     """
@@ -35,7 +38,6 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
-            'password'
         )
 
     def get_is_subscribed(self, object):
@@ -43,4 +45,6 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(object, 'is_subscribed'):
+            return object.is_subscribed
         return object.author.filter(subscriber=request.user).exists()
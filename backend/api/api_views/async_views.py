@@ -0,0 +1,212 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext as _
+from django_filters.utils import translate_validation
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from api.api_serializers.recipes_serializers import (
+    RecipeSerializer, TagSerializer)
+from api.api_views.filters import RecipeFilter
+from api.api_views.mixins import (
+    get_conditional_validators, set_conditional_headers)
+from api.api_views.pagination import RecipePagination
+from api.api_views.recipes_views import (
+    IngredientViewSet, RecipeViewSet, TagViewSet, get_recipe_fields,
+    get_recipe_queryset, get_recipe_version_parts)
+from api.api_views.renderers import SHOPPING_CART_RENDERERS
+from api.api_views.utils import (
+    SHOPPING_CART_EXPORTS, aget_cached_shopping_cart, astream_shopping_cart,
+    shopping_cart_response, shopping_cart_stream_response)
+from recipes import shopping_list
+from recipes.cache_versions import INGREDIENTS_VERSION, TAGS_VERSION
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Tag
+
+content_negotiation = DefaultContentNegotiation()
+
+
+async def authenticate(request):
+    """ Пользователь по заголовку Authorization: Token <ключ>,
+    как в TokenAuthentication, но через асинхронный ORM. """
+    auth = request.headers.get('Authorization', '').split()
+    if not auth or auth[0].lower() != 'token':
+        return AnonymousUser()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+    token = await Token.objects.select_related('user').filter(
+        key=auth[1]).afirst()
+    if token is None:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+def json_response(request, data):
+    return HttpResponse(
+        request.accepted_renderer.render(data, request.accepted_media_type),
+        content_type=request.accepted_renderer.media_type)
+
+
+def error_response(exc):
+    """ Ответ на исключение DRF в том же виде, что и у APIView. """
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = HttpResponse(
+        JSONRenderer().render(data), content_type='application/json',
+        status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated,
+                        exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def async_read_view(sync_view, renderer_classes=None):
+    """ Обрабатывает GET и HEAD асинхронным обработчиком.
+    Остальные методы, а также запросы, для которых выбран не JSON
+    (например, браузерный API), передаются синхронному представлению.
+    С renderer_classes формат выбирается из них и обрабатывается
+    асинхронно, каким бы он ни был. """
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(sync_view)(
+                    request, *args, **kwargs)
+            drf_request = Request(request)
+            try:
+                renderer, media_type = content_negotiation.select_renderer(
+                    drf_request,
+                    [renderer() for renderer in (
+                        renderer_classes
+                        or api_settings.DEFAULT_RENDERER_CLASSES)])
+                if (renderer_classes is None
+                        and not isinstance(renderer, JSONRenderer)):
+                    return await sync_to_async(sync_view)(
+                        request, *args, **kwargs)
+                drf_request.accepted_renderer = renderer
+                drf_request.accepted_media_type = media_type
+                drf_request.user = await authenticate(request)
+                return await handler(drf_request, *args, **kwargs)
+            except Http404:
+                return error_response(exceptions.NotFound())
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def conditional_response(request, version_parts, handler,
+                               vary_headers=()):
+    """ Асинхронный вариант ConditionalGetMixin.conditional_response. """
+    etag, last_modified = await sync_to_async(get_conditional_validators)(
+        request, version_parts)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await handler()
+        if response.status_code != 200:
+            return response
+    return set_conditional_headers(
+        response, etag, last_modified, vary_headers)
+
+
+def filter_recipes(request, queryset):
+    filterset = RecipeFilter(request.query_params, queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def serialize_recipes(request, recipes, many=False):
+    return RecipeSerializer(
+        recipes, many=many, context={'request': request}).data
+
+
+@async_read_view(
+    TagViewSet.as_view({'get': 'list'}, basename='tags', detail=False))
+async def tag_list(request):
+    async def respond():
+        tags = [tag async for tag in Tag.objects.all()]
+        return json_response(request, TagSerializer(tags, many=True).data)
+
+    return await conditional_response(request, [(TAGS_VERSION,)], respond)
+
+
+@async_read_view(IngredientViewSet.as_view(
+    {'get': 'list'}, basename='ingredients', detail=False))
+async def ingredient_list(request):
+    async def respond():
+        name = request.query_params.get('name')
+        if name:
+            ingredients = await ingredient_index.asearch(
+                name, settings.INGREDIENT_SEARCH_LIMIT)
+        else:
+            ingredients = await ingredient_index.aall()
+        return json_response(request, ingredients)
+
+    return await conditional_response(
+        request, [(INGREDIENTS_VERSION,)], respond)
+
+
+@async_read_view(RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='recipes', detail=False))
+async def recipe_list(request):
+    async def respond():
+        queryset = await sync_to_async(filter_recipes)(
+            request, get_recipe_queryset(
+                request.user, get_recipe_fields(request)))
+        paginator = RecipePagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        data = await sync_to_async(serialize_recipes)(
+            request, page, many=True)
+        return json_response(request, paginator.get_paginated_data(data))
+
+    return await conditional_response(
+        request, get_recipe_version_parts(request.user), respond,
+        RecipeViewSet.conditional_vary_headers)
+
+
+@async_read_view(RecipeViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+    'delete': 'destroy'}, basename='recipes', detail=True))
+async def recipe_detail(request, pk):
+    async def respond():
+        recipe = await get_recipe_queryset(
+            request.user, get_recipe_fields(request)).filter(pk=pk).afirst()
+        if recipe is None:
+            raise exceptions.NotFound()
+        data = await sync_to_async(serialize_recipes)(request, recipe)
+        return json_response(request, data)
+
+    return await conditional_response(
+        request, get_recipe_version_parts(request.user, pk), respond,
+        RecipeViewSet.conditional_vary_headers)
+
+
+@async_read_view(
+    RecipeViewSet.as_view({'get': 'download_shopping_cart'},
+                          basename='recipes', detail=False),
+    renderer_classes=SHOPPING_CART_RENDERERS)
+async def download_shopping_cart(request):
+    user = request.user
+    if not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    ingredients_cart = shopping_list.get_shopping_list(user.pk)
+    export = SHOPPING_CART_EXPORTS.get(request.accepted_renderer.format)
+    if export is not None:
+        return shopping_cart_stream_response(
+            export, astream_shopping_cart(export(), ingredients_cart))
+    return shopping_cart_response(
+        await aget_cached_shopping_cart(user, ingredients_cart))
@@ -1,6 +1,8 @@
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
 
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 
 
 class IngredientSearchFilter(filters.FilterSet):
@@ -12,6 +14,17 @@ class IngredientSearchFilter(filters.FilterSet):
         fields = ('name', )
 
 
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """ Сортировка рецептов. Для одинаковых значений порядок
+    задается датой публикации, как в выдаче по умолчанию. """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, '-pub_date', '-id')
+
+
 class RecipeFilter(filters.FilterSet):
     """ Фильтр выборки рецептов по определенным полям. """
 
@@ -21,6 +34,9 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_favorite_and_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = RecipeOrderingFilter(
+        fields=('favorites_count', 'in_carts_count', 'pub_date'))
 
     def filter_favorite_and_cart(self, queryset, name, value):
         user = self.request.user
@@ -30,6 +46,12 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(favoriting__user=user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """ Полнотекстовый поиск по названию и описанию с ранжированием. """
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited')
@@ -0,0 +1,61 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.cache_versions import get_version_timestamp, get_versions
+
+
+def get_conditional_validators(request, version_parts):
+    """ ETag и Last-Modified ответа по меткам версий. """
+    versions = get_versions(*version_parts)
+    etag_source = '|'.join(
+        (*versions, request.get_full_path())).encode('utf-8')
+    etag = quote_etag(md5(etag_source, usedforsecurity=False).hexdigest())
+    last_modified = int(max(map(get_version_timestamp, versions)))
+    return etag, last_modified
+
+
+def set_conditional_headers(response, etag, last_modified, vary_headers=()):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if vary_headers:
+        patch_vary_headers(response, vary_headers)
+    return response
+
+
+class ConditionalGetMixin:
+    """ ETag и Last-Modified для list и retrieve.
+    Валидаторы вычисляются из меток версий, которые обновляются сигналами
+    при изменении данных, поэтому ответ 304 отдается до выполнения
+    запросов к БД и сериализации. """
+    conditional_vary_headers = ()
+
+    def get_version_parts(self):
+        """ Ключи меток версий, от которых зависит ответ. """
+        raise NotImplementedError
+
+    def get_conditional_validators(self, request):
+        return get_conditional_validators(request, self.get_version_parts())
+
+    def set_conditional_headers(self, response, etag, last_modified):
+        return set_conditional_headers(
+            response, etag, last_modified, self.conditional_vary_headers)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.set_conditional_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
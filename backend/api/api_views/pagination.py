@@ -0,0 +1,213 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import FloatField, Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.mediatypes import _MediaType
+from rest_framework.utils.urls import replace_query_param
+
+KEYSET_ORDERING = ('-pub_date', '-id')
+
+
+def get_keyset_ordering(queryset):
+    """ Сортировка выборки как ключ курсора: каждое поле один раз,
+    последним идет id, чтобы ключ был уникальным. Сортировку
+    выражениями курсор не поддерживает. """
+    ordering = []
+    seen = set()
+    source = queryset.query.order_by or (
+        queryset.query.default_ordering
+        and queryset.model._meta.ordering) or KEYSET_ORDERING
+    for item in source:
+        if not isinstance(item, str) or item == '?':
+            raise ParseError('Курсор не поддерживает эту сортировку.')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = 'id'
+        if name in seen:
+            continue
+        seen.add(name)
+        ordering.append(('-' if item.startswith('-') else '') + name)
+        if name == 'id':
+            return ordering
+    ordering.append('-id')
+    return ordering
+
+
+def get_ordering_field(queryset, name):
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    return queryset.model._meta.get_field(name)
+
+
+def is_exact_key(queryset, ordering):
+    """ Можно ли продолжить выдачу по значениям ключа из курсора.
+    Ранг поиска (float) после передачи через JSON не совпадает
+    с сохраненным в базе, и условие на равенство не срабатывает. """
+    return not any(
+        isinstance(get_ordering_field(queryset, item.lstrip('-')),
+                   FloatField)
+        for item in ordering)
+
+
+def load_keyset_fields(queryset, ordering):
+    """ Добавляет поля ключа к загружаемым через only() (?fields=),
+    иначе encode_cursor читал бы каждое из них отдельным запросом. """
+    loaded, deferred = queryset.query.deferred_loading
+    if deferred or not loaded:
+        return queryset
+    names = [
+        item.lstrip('-') for item in ordering
+        if item.lstrip('-') not in queryset.query.annotations]
+    return queryset.only(*loaded, *names)
+
+
+def get_keyset_condition(ordering, values):
+    """ Условие «строго после позиции values» для сортировки ordering. """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for item, value in zip(ordering, values):
+        name = item.lstrip('-')
+        lookup = 'lt' if item.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class RecipePagination(PageNumberPagination):
+    """ Постраничный вывод рецептов.
+    По умолчанию работает по номеру страницы. С параметром cursor
+    (или Accept: application/json; pagination=cursor) переключается на
+    курсор по полям текущей сортировки (?ordering=, по умолчанию
+    pub_date) и id: страница выбирается условием по ключу без OFFSET
+    и без подсчета общего количества. Выдача поиска, упорядоченная
+    по рангу, всегда идет по номерам страниц. """
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def is_cursor_mode(self, request, queryset):
+        if self.cursor_query_param not in request.query_params:
+            media_type = _MediaType(
+                getattr(request, 'accepted_media_type', ''))
+            if media_type.params.get('pagination') != 'cursor':
+                return False
+        self.keyset_ordering = get_keyset_ordering(queryset)
+        return is_exact_key(queryset, self.keyset_ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request, queryset)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        results = list(self.get_keyset_queryset(queryset)[:page_size + 1])
+        return self.set_cursor_page(results, page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """ То же, что paginate_queryset, но страница и количество
+        читаются асинхронным ORM. """
+        self.request = request
+        self.cursor_mode = self.is_cursor_mode(request, queryset)
+        page_size = self.get_page_size(request)
+        if self.cursor_mode:
+            results = [
+                obj async for obj in
+                self.get_keyset_queryset(queryset)[:page_size + 1]
+            ]
+            return self.set_cursor_page(results, page_size)
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        object_list = [
+            obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = Page(object_list, number, paginator)
+        return object_list
+
+    def get_keyset_queryset(self, queryset):
+        queryset = load_keyset_fields(
+            queryset.order_by(*self.keyset_ordering), self.keyset_ordering)
+        values = self.decode_cursor(self.request, queryset)
+        if values is not None:
+            queryset = queryset.filter(
+                get_keyset_condition(self.keyset_ordering, values))
+        return queryset
+
+    def set_cursor_page(self, results, page_size):
+        self.base_url = self.request.build_absolute_uri()
+        self.page = results[:page_size]
+        self.has_next = len(results) > page_size
+        return self.page
+
+    def decode_cursor(self, request, queryset):
+        """ Значения полей сортировки из курсора. Курсор, выданный
+        для другой сортировки, считается неверным. """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            ordering, values = json.loads(b64decode(encoded.encode('ascii')))
+            if ordering != self.keyset_ordering:
+                raise ValueError(ordering)
+            return [
+                get_ordering_field(queryset, item.lstrip('-')).to_python(
+                    value)
+                for item, value in zip(ordering, values, strict=True)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, recipe):
+        position = [
+            self.keyset_ordering,
+            [encode_value(getattr(recipe, item.lstrip('-')))
+             for item in self.keyset_ordering],
+        ]
+        return b64encode(json.dumps(
+            position, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            self.encode_cursor(self.page[-1]))
+
+    def get_paginated_data(self, data):
+        if not self.cursor_mode:
+            return OrderedDict([
+                ('count', self.page.paginator.count),
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data),
+            ])
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
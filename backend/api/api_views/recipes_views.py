@@ -1,31 +1,93 @@
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions, status
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 
+from recipes import counters, feed, shopping_list
+from recipes.cache_versions import (
+    INGREDIENTS_VERSION, RECIPE_COUNTERS_VERSION, RECIPE_VERSION,
+    RECIPES_VERSION, SHOPPING_CART_VERSION, TAGS_VERSION, USERS_VERSION,
+    VIEWER_VERSION, bump_version)
 from recipes.models import (
-    Tag, Ingredient, Recipe, Favorite, ShoppingCart, RecipeIngredient)
-from api.api_views.utils import create_shopping_cart
+    Tag, Ingredient, Recipe, Favorite, ShoppingCart)
+from recipes.ingredient_index import ingredient_index
+from users.models import CustomUser
+from api.api_views.renderers import SHOPPING_CART_RENDERERS
+from api.api_views.utils import (
+    SHOPPING_CART_EXPORTS, get_cached_shopping_cart,
+    shopping_cart_response, shopping_cart_stream_response,
+    stream_shopping_cart)
 from api.api_serializers.recipes_serializers import (
     TagSerializer, IngredientSerializer,
     RecipeSerializer, RecipeCreateSerializer,
-    RecipeShortSerializer)
+    RecipeShortSerializer, RecipeIdsSerializer, VIEWER_FIELDS)
+from api.api_serializers.sparse_fields import (
+    get_model_columns, get_sparse_fields)
 from .filters import RecipeFilter, IngredientSearchFilter
+from .mixins import ConditionalGetMixin
+from .pagination import RecipePagination
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def get_recipe_version_parts(user, pk=None):
+    """ Метки версий, от которых зависят список рецептов
+    или отдельный рецепт в выдаче для пользователя.
+    Метки счетчиков избранного и корзин у каждого рецепта свои,
+    и от них зависит только страница рецепта. ETag списков счетчики
+    не меняют: в закешированном клиентом списке они могут отставать
+    до следующего изменения рецептов, зато отметка одного рецепта
+    не сбрасывает ETag всех списков. """
+    parts = [(TAGS_VERSION,), (INGREDIENTS_VERSION,), (USERS_VERSION,)]
+    if pk is not None:
+        parts.append((RECIPE_VERSION, pk))
+        parts.append((RECIPE_COUNTERS_VERSION, pk))
+    else:
+        parts.append((RECIPES_VERSION,))
+    if user.is_authenticated:
+        parts.append((VIEWER_VERSION, user.pk))
+    return parts
+
+
+def get_recipe_queryset(user, fields=None):
+    """ Рецепты для выдачи с флагами текущего пользователя.
+    При заданном наборе полей ответа загружаются только нужные
+    для них столбцы, автор и флаги. """
+    if fields is None:
+        return Recipe.objects.select_related('author').defer(
+            'search_vector').with_user_flags(user)
+    columns = get_model_columns(Recipe, fields)
+    if 'image' in fields:
+        columns.extend(('image_thumbnail', 'image_medium'))
+    # Автор и дата публикации нужны ключам кеша и курсору страниц.
+    queryset = Recipe.objects.only('id', 'author', 'pub_date', *columns)
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    if VIEWER_FIELDS.intersection(fields):
+        queryset = queryset.with_user_flags(user)
+    return queryset
+
+
+def get_recipe_fields(request):
+    """ Поля ответа со списком или страницей рецепта. """
+    return get_sparse_fields(request, RecipeSerializer.Meta.fields)
+
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ Просмотр тегов. Только чтение. """
     queryset = Tag.objects.all()
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
     serializer_class = TagSerializer
 
+    def get_version_parts(self):
+        return [(TAGS_VERSION,)]
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ Просмотр ингредиентов. Только чтение. """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -34,21 +96,63 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientSearchFilter
     search_fields = ('^name',)
 
+    def get_version_parts(self):
+        return [(INGREDIENTS_VERSION,)]
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_from_index, request, *args, **kwargs)
+
+    def list_from_index(self, request, *args, **kwargs):
+        """ Отдает ингредиенты из индекса в памяти без обращения к БД. """
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT))
+        return Response(ingredient_index.all())
+
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ Просмотр и управление рецептами.
       Чтение, создание, обновление, удаление.
     """
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
+    conditional_vary_headers = ('Authorization',)
+
+    def get_version_parts(self):
+        return get_recipe_version_parts(
+            self.request.user,
+            self.kwargs['pk'] if self.action == 'retrieve' else None)
+
+    def get_queryset(self):
+        return get_recipe_queryset(
+            self.request.user, get_recipe_fields(self.request))
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        with shopping_list.applied_explicitly():
+            shopping_list.remove_recipe_everywhere(instance.pk)
+            instance.delete()
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    @action(detail=False, methods=['get'], url_path='feed', url_name='feed',
+            permission_classes=(permissions.IsAuthenticated,))
+    def get_feed(self, request):
+        """ Лента рецептов авторов, на которых подписан пользователь. """
+        queryset = self.filter_queryset(
+            self.get_queryset().filter(feed.get_feed_filter(request.user)))
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post', 'delete'],
             url_path='shopping_cart', url_name='shopping_cart',
             permission_classes=(permissions.IsAuthenticated,))
@@ -56,31 +160,111 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """ Добавляет или удаляет рецепт из
           корзины покупок текущего пользователя. """
         recipe = get_object_or_404(Recipe, pk=pk)
-        if request.method == 'POST':
-            ShoppingCart.objects.get_or_create(user=request.user,
-                                               recipe=recipe)
-            status_code = status.HTTP_201_CREATED
-        else:
-            request.user.shopping_user.filter(recipe=recipe).delete()
-            status_code = status.HTTP_204_NO_CONTENT
+        with transaction.atomic():
+            if request.method == 'POST':
+                _, created = ShoppingCart.objects.get_or_create(
+                    user=request.user, recipe=recipe)
+                if created:
+                    counters.change_counter(
+                        counters.IN_CARTS_COUNT, [recipe.pk], 1)
+                status_code = status.HTTP_201_CREATED
+            else:
+                deleted, _ = request.user.shopping_user.filter(
+                    recipe=recipe).delete()
+                if deleted:
+                    counters.change_counter(
+                        counters.IN_CARTS_COUNT, [recipe.pk], -1)
+                status_code = status.HTTP_204_NO_CONTENT
 
         shopping_cart_serializer = RecipeShortSerializer(recipe)
         return Response(shopping_cart_serializer.data, status=status_code)
 
+    def change_many(self, request, model, counter_field):
+        """ Добавляет (POST) или удаляет (DELETE) пачку рецептов
+        в корзине или избранном пользователя. Возвращает результат
+        для каждого переданного id. """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(
+            serializer.validated_data['recipes']))
+        user = request.user
+        adding = request.method == 'POST'
+
+        with transaction.atomic():
+            list(CustomUser.objects.select_for_update().filter(
+                pk=user.pk).values_list('pk'))
+            present = dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+                present=Exists(model.objects.filter(
+                    user=user, recipe=OuterRef('pk')))
+            ).values_list('pk', 'present'))
+            if adding:
+                changed = [pk for pk in recipe_ids
+                           if pk in present and not present[pk]]
+                model.objects.bulk_create(
+                    [model(user=user, recipe_id=pk) for pk in changed],
+                    ignore_conflicts=True)
+            else:
+                changed = [pk for pk in recipe_ids if present.get(pk)]
+                with shopping_list.applied_explicitly():
+                    model.objects.filter(
+                        user=user, recipe__in=changed).delete()
+
+            if changed:
+                if model is ShoppingCart:
+                    if adding:
+                        shopping_list.add_recipes(user.pk, changed)
+                    else:
+                        shopping_list.remove_recipes(user.pk, changed)
+                    bump_version(SHOPPING_CART_VERSION, user.pk)
+                counters.change_counter(
+                    counter_field, changed, 1 if adding else -1)
+                bump_version(VIEWER_VERSION, user.pk)
+
+        changed = set(changed)
+        results = []
+        for pk in recipe_ids:
+            if pk not in present:
+                result = 'not_found'
+            elif pk in changed:
+                result = 'added' if adding else 'removed'
+            else:
+                result = 'unchanged'
+            results.append({'id': pk, 'status': result})
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart', url_name='shopping_cart_many',
+            permission_classes=(permissions.IsAuthenticated,))
+    def change_shopping_cart(self, request):
+        """ Пакетно добавляет или удаляет рецепты из корзины покупок. """
+        return self.change_many(
+            request, ShoppingCart, counters.IN_CARTS_COUNT)
+
+    @action(detail=False, methods=['post', 'delete'], url_path='favorite',
+            url_name='favorite_many',
+            permission_classes=(permissions.IsAuthenticated,))
+    def change_favorites(self, request):
+        """ Пакетно добавляет или удаляет рецепты из избранного. """
+        return self.change_many(
+            request, Favorite, counters.FAVORITES_COUNT)
+
     @action(detail=False, methods=['get'], url_path='download_shopping_cart',
             url_name='download_shopping_cart',
-            permission_classes=(permissions.IsAuthenticated,)
+            permission_classes=(permissions.IsAuthenticated,),
+            renderer_classes=SHOPPING_CART_RENDERERS
             )
     def download_shopping_cart(self, request):
-        """ Позволяет пользователю загрузить список покупок. """
+        """ Позволяет пользователю загрузить список покупок.
+        Формат выбирается по ?format= или Accept: PDF по умолчанию,
+        csv, txt и json отдаются потоком. """
         user = request.user
-        recipe_ingredients_query = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_recipe__user=user
-            ).values('ingredient__name', 'ingredient__measurement_unit',
-                     ).order_by('ingredient__name').annotate(
-                         ingredient_amount=Sum('amount')))
-        return create_shopping_cart(recipe_ingredients_query)
+        ingredients_cart = shopping_list.get_shopping_list(user.pk)
+        export = SHOPPING_CART_EXPORTS.get(request.accepted_renderer.format)
+        if export is not None:
+            return shopping_cart_stream_response(
+                export, stream_shopping_cart(export(), ingredients_cart))
+        return shopping_cart_response(
+            get_cached_shopping_cart(user, ingredients_cart))
 
     @action(detail=True, methods=['post', 'delete'], url_path='favorite',
             url_name='favorite', permission_classes=(
@@ -95,8 +279,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }
 
         if request.method == 'POST':
-            favorite, created = Favorite.objects.get_or_create(user=user,
-                                                               recipe=recipe)
+            with transaction.atomic():
+                favorite, created = Favorite.objects.get_or_create(
+                    user=user, recipe=recipe)
+                if created:
+                    counters.change_counter(
+                        counters.FAVORITES_COUNT, [recipe.pk], 1)
             if created:
                 return Response(data, status=status.HTTP_201_CREATED)
             return Response(data, status=status.HTTP_400_BAD_REQUEST)
@@ -104,5 +292,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'DELETE':
             favorite_recipe = get_object_or_404(Favorite,
                                                 user=user, recipe=recipe)
-            favorite_recipe.delete()
+            with transaction.atomic():
+                favorite_recipe.delete()
+                counters.change_counter(
+                    counters.FAVORITES_COUNT, [recipe.pk], -1)
             return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import re
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from rest_framework.renderers import JSONRenderer
+
+from api.api_serializers.recipes_serializers import TagSerializer
+from recipes.cache_versions import (INGREDIENTS_VERSION, TAGS_VERSION,
+                                    get_versions)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Tag
+
+REFERENCE_KEY_PREFIX = 'reference'
+# Ссылку с актуальной версией ?v=<version> можно кешировать навсегда:
+# при изменении справочников меняется и версия.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class ReferenceBundle:
+    """ Теги и ингредиенты одним готовым JSON и его gzip-копией.
+    Сборка выполняется один раз на метки версий тегов и ингредиентов:
+    результат хранится в общем кеше (Redis, см. REDIS_URL) и в памяти
+    процесса, поэтому запрос обходится без БД и сериализации. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._versions = None
+        self._bundle = None
+
+    @staticmethod
+    def _build():
+        data = {
+            'tags': TagSerializer(Tag.objects.all(), many=True).data,
+            'ingredients': ingredient_index.all(),
+        }
+        renderer = JSONRenderer()
+        version = hashlib.sha256(
+            renderer.render(data)).hexdigest()[:20]
+        body = renderer.render({'version': version, **data})
+        return {
+            'version': version,
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        }
+
+    def get(self):
+        """ Готовый набор: version, body и gzip. """
+        versions = tuple(
+            get_versions((TAGS_VERSION,), (INGREDIENTS_VERSION,)))
+        if self._versions == versions:
+            return self._bundle
+        with self._lock:
+            if self._versions != versions:
+                cache_key = ':'.join((REFERENCE_KEY_PREFIX, *versions))
+                bundle = cache.get(cache_key)
+                if bundle is None:
+                    bundle = self._build()
+                    cache.set(cache_key, bundle,
+                              settings.REFERENCE_CACHE_TIMEOUT)
+                self._bundle = bundle
+                self._versions = versions
+        return self._bundle
+
+
+reference_bundle = ReferenceBundle()
+
+
+@require_safe
+def reference_view(request):
+    """ Справочники тегов и ингредиентов одним запросом.
+    Ответ уже сжат, ETag совпадает с версией содержимого. """
+    bundle = reference_bundle.get()
+    use_gzip = bool(
+        ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')))
+    etag = quote_etag(
+        bundle['version'] + ('-gzip' if use_gzip else ''))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if use_gzip:
+            response = HttpResponse(
+                bundle['gzip'], content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                bundle['body'], content_type='application/json')
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if request.GET.get('v') == bundle['version']:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
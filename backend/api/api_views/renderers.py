@@ -0,0 +1,65 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson is not None else 0)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ JSONRenderer на orjson, если он установлен.
+    Типы, которых orjson не знает (Decimal, ленивые строки, timedelta,
+    QuerySet), приводятся кодировщиком DRF, поэтому ответ совпадает
+    с JSONRenderer. Ответы с отступами (браузерный API, indent=
+    в Accept) и окружение без orjson обслуживает JSONRenderer. """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.get_indent(
+                accepted_media_type, renderer_context or {})):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+
+
+class DownloadRenderer(BaseRenderer):
+    """ Формат выгрузки для согласования по Accept и ?format=.
+    Содержимое файла формирует само представление, через рендерер
+    проходят только ошибки, и они отдаются как JSON. """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return FastJSONRenderer().render(data)
+
+
+class PDFDownloadRenderer(DownloadRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class CSVDownloadRenderer(DownloadRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TextDownloadRenderer(DownloadRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class JSONDownloadRenderer(DownloadRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+
+# PDF первым: он выбирается, если клиент не указал формат.
+SHOPPING_CART_RENDERERS = (
+    PDFDownloadRenderer, CSVDownloadRenderer, TextDownloadRenderer,
+    JSONDownloadRenderer)
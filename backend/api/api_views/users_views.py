@@ -1,3 +1,7 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Value
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
@@ -6,19 +10,54 @@ from djoser.views import UserViewSet
 from rest_framework.pagination import PageNumberPagination
 
 from users.models import CustomUser, AuthorSubscription
+from recipes.models import Recipe
 from api.api_serializers.users_serializers import CustomUserSerializer
+from api.api_serializers.sparse_fields import (
+    get_model_columns, get_sparse_fields)
 from api.api_serializers.recipes_serializers import (
     SubscriptionSerializer,
     SubscriptionShowSerializer)
 from api.permissions import AnonimOrAuthenticatedReadOnly
 
 
+def get_recipes_limit(request):
+    """ Возвращает параметр recipes_limit. Если он не задан
+    или некорректен, используется SUBSCRIPTION_RECIPES_LIMIT. """
+    recipes_limit = request.query_params.get('recipes_limit')
+    try:
+        recipes_limit = int(recipes_limit)
+    except (TypeError, ValueError):
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    if recipes_limit < 0:
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    return recipes_limit
+
+
+def attach_author_recipes(authors, recipes_limit):
+    """ Подгружает последние рецепты авторов одним запросом. """
+    recipes_by_author = defaultdict(list)
+    for recipe in Recipe.objects.latest_for_authors(authors, recipes_limit):
+        recipes_by_author[recipe.author_id].append(recipe)
+    for author in authors:
+        author.limited_recipes = recipes_by_author[author.id]
+    return authors
+
+
 class CustomUserViewSet(UserViewSet):
     """ Пользователи: просмотр и управление. """
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [AnonimOrAuthenticatedReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = get_sparse_fields(
+            self.request, CustomUserSerializer.Meta.fields)
+        if fields is not None:
+            queryset = queryset.only(
+                'id', *get_model_columns(CustomUser, fields))
+        return queryset
+
     @action(detail=False, methods=['get', 'patch'],
             url_path='my-profile', url_name='my-profile')
     def profile(self, request):
@@ -43,7 +82,10 @@ class CustomUserViewSet(UserViewSet):
         """ Позволяет пользователю подписываться/отписываться
         от автора контента. """
         user = request.user
-        content_author = get_object_or_404(CustomUser, id=id)
+        content_author = get_object_or_404(
+            CustomUser.objects.annotate(recipes_count=Count('recipes')),
+            id=id
+        )
 
         if request.method == 'POST':
             serializer = SubscriptionSerializer(
@@ -51,6 +93,8 @@ class CustomUserViewSet(UserViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            content_author.is_subscribed = True
+            attach_author_recipes([content_author], get_recipes_limit(request))
             user_serializer = SubscriptionShowSerializer(
                 content_author, context={'request': request}
             )
@@ -62,14 +106,7 @@ class CustomUserViewSet(UserViewSet):
                 AuthorSubscription, subscriber=user, author=content_author
             )
             subscription_object.delete()
-            authors = CustomUser.objects.filter(author__subscriber=user)
-            paginator = PageNumberPagination()
-            obj = paginator.paginate_queryset(
-                queryset=authors, request=request)
-            serializer = SubscriptionShowSerializer(
-                obj, context={'request': request}, many=True
-            )
-            return paginator.get_paginated_response(serializer.data)
+            return self.get_subscriptions_response(request)
 
     @action(
         detail=False,
@@ -78,11 +115,30 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """ Возвращает авторов, на которых подписан
         пользователь. """
-        user = request.user
-        subscriptions = CustomUser.objects.filter(author__subscriber=user)
+        return self.get_subscriptions_response(request)
+
+    def get_subscriptions_response(self, request):
+        """ Страница подписок с рецептами авторов и их количеством.
+        Рецепты и их число подгружаются, только если они есть
+        в ответе. """
+        fields = get_sparse_fields(
+            request, SubscriptionShowSerializer.Meta.fields)
+        subscriptions = CustomUser.objects.filter(
+            author__subscriber=request.user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).order_by('username')
+        if fields is not None:
+            subscriptions = subscriptions.only(
+                'id', *get_model_columns(CustomUser, fields))
+        if fields is None or 'recipes_count' in fields:
+            subscriptions = subscriptions.annotate(
+                recipes_count=Count('recipes'))
         paginator = PageNumberPagination()
         obj = paginator.paginate_queryset(
             queryset=subscriptions, request=request)
+        if fields is None or 'recipes' in fields:
+            attach_author_recipes(obj, get_recipes_limit(request))
         serializer = SubscriptionShowSerializer(
             obj, context={'request': request}, many=True
         )
@@ -1,23 +1,39 @@
-import io
+import csv
+import json
+import os
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+
+from recipes.cache_versions import (
+    INGREDIENTS_VERSION, SHOPPING_CART_VERSION, get_version)
 
 FONT_SIZE_TITLE = 24
 X_COORDINATE = 200
 Y_COORDINATE = 800
 FONT_SIZE_NORMAL = 13
 MIN_DISTANCE_FROM_BOTTOM = 50
+# Сколько строк списка покупок собирается в один фрагмент потока.
+EXPORT_CHUNK_ROWS = 100
 
 
-def create_shopping_cart(ingredients_cart):
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'] = "attachment; filename='shopping_cart.pdf'"
-    pdfmetrics.registerFont(TTFont('Arial', 'data/arial.ttf', 'UTF-8'))
-    buffer = io.BytesIO()
-    pdf_file = canvas.Canvas(buffer)
+@lru_cache(maxsize=None)
+def register_font():
+    """ Регистрирует шрифт один раз на процесс. """
+    pdfmetrics.registerFont(TTFont(
+        'Arial', os.path.join(settings.CSV_FILES_DIR, 'arial.ttf'), 'UTF-8'))
+
+
+def render_shopping_cart(ingredients_cart):
+    """ Формирует PDF списка покупок и возвращает его содержимое. """
+    register_font()
+    pdf_file = canvas.Canvas(None)
     pdf_file.setFont('Arial', FONT_SIZE_TITLE)
     pdf_file.drawString(X_COORDINATE, Y_COORDINATE, 'Мой список покупок.')
     pdf_file.setFont('Arial', FONT_SIZE_NORMAL)
@@ -44,8 +60,165 @@ def create_shopping_cart(ingredients_cart):
             pdf_file.setFont('Arial', FONT_SIZE_NORMAL)
 
     pdf_file.showPage()
-    pdf_file.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
+    return pdf_file.getpdfdata()
+
+
+def shopping_cart_response(pdf):
+    """ Отдает готовый PDF без промежуточного копирования. """
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response[
+        'Content-Disposition'] = "attachment; filename='shopping_cart.pdf'"
+    return response
+
+
+def get_shopping_cart_cache_key(user):
+    """ Ключ кеша PDF, зависящий от версии корзины пользователя
+    и версии справочника ингредиентов. """
+    return 'shopping_cart_pdf:{}:{}:{}'.format(
+        user.pk,
+        get_version(SHOPPING_CART_VERSION, user.pk),
+        get_version(INGREDIENTS_VERSION),
+    )
+
+
+def get_cached_shopping_cart(user, ingredients_cart):
+    """ Возвращает PDF списка покупок из кеша или формирует его.
+    ingredients_cart вычисляется только при промахе кеша. """
+    cache_key = get_shopping_cart_cache_key(user)
+    pdf = cache.get(cache_key)
+    if pdf is None:
+        pdf = render_shopping_cart(ingredients_cart)
+        cache.set(cache_key, pdf, settings.SHOPPING_CART_CACHE_TIMEOUT)
+    return pdf
+
+
+async def aget_cached_shopping_cart(user, ingredients_cart):
+    """ Асинхронный вариант get_cached_shopping_cart: строки читаются
+    асинхронным ORM, PDF формируется в пуле потоков, не занимая
+    цикл событий. """
+    cache_key = await sync_to_async(get_shopping_cart_cache_key)(user)
+    pdf = await cache.aget(cache_key)
+    if pdf is None:
+        rows = [row async for row in ingredients_cart]
+        pdf = await sync_to_async(
+            render_shopping_cart, thread_sensitive=False)(rows)
+        await cache.aset(cache_key, pdf, settings.SHOPPING_CART_CACHE_TIMEOUT)
+    return pdf
+
+
+class Echo:
+    """ Буфер для csv.writer, возвращающий записанную строку. """
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartExport:
+    """ Текстовый формат списка покупок: заголовок, строка
+    на каждый ингредиент и окончание файла. """
+    media_type = None
+    format = None
+
+    def header(self):
+        return ''
+
+    def line(self, number, ingredient):
+        raise NotImplementedError
+
+    def footer(self):
+        return ''
+
+
+class CSVExport(ShoppingCartExport):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+
+    def line(self, number, ingredient):
+        return self.writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient_amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+class TextExport(ShoppingCartExport):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def header(self):
+        return 'Мой список покупок.\n\n'
+
+    def line(self, number, ingredient):
+        return '{}. {} — {} {}\n'.format(
+            number,
+            ingredient['ingredient__name'],
+            ingredient['ingredient_amount'],
+            ingredient['ingredient__measurement_unit'],
+        )
+
+
+class JSONExport(ShoppingCartExport):
+    media_type = 'application/json'
+    format = 'json'
+
+    def header(self):
+        return '['
+
+    def line(self, number, ingredient):
+        return (',' if number > 1 else '') + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['ingredient_amount'],
+        }, ensure_ascii=False)
+
+    def footer(self):
+        return ']'
+
+
+SHOPPING_CART_EXPORTS = {
+    export.format: export for export in (CSVExport, TextExport, JSONExport)}
+
+
+def stream_shopping_cart(export, ingredients_cart):
+    """ Генератор файла списка покупок. Строки читаются из базы
+    порциями через iterator(), заголовок уходит клиенту сразу. """
+    yield export.header()
+    chunk = []
+    for number, ingredient in enumerate(
+            ingredients_cart.iterator(), start=1):
+        chunk.append(export.line(number, ingredient))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(export.footer())
+    yield ''.join(chunk)
+
+
+async def astream_shopping_cart(export, ingredients_cart):
+    """ Асинхронный вариант stream_shopping_cart. """
+    yield export.header()
+    chunk = []
+    number = 0
+    async for ingredient in ingredients_cart.aiterator():
+        number += 1
+        chunk.append(export.line(number, ingredient))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(export.footer())
+    yield ''.join(chunk)
+
+
+def shopping_cart_stream_response(export, chunks):
+    """ Потоковый ответ с файлом списка покупок. """
+    response = StreamingHttpResponse(
+        chunks, content_type=f'{export.media_type}; charset=utf-8')
+    response['Content-Disposition'] = (
+        f"attachment; filename='shopping_cart.{export.format}'")
     return response
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Соединения создаются в разных потоках (под ASGI - в потоках
+        # sync_to_async), поэтому замеры подключаются к каждому
+        # соединению при его открытии, а не при загрузке middleware.
+        if settings.REQUEST_METRICS_ENABLED:
+            from api.middleware import install_query_recorder
+            connection_created.connect(install_query_recorder)
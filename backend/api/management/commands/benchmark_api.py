@@ -0,0 +1,287 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+from itertools import cycle
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes import counters, feed, shopping_list
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import AuthorSubscription, CustomUser
+
+DEFAULT_SIZES = (100, 1000)
+INGREDIENT_WORDS = ('сахар', 'соль', 'мука', 'молоко', 'масло', 'сыр',
+                    'рис', 'лук', 'морковь', 'картофель')
+INGREDIENTS_PER_RECIPE = 4
+RECIPES_PER_AUTHOR = 10
+VIEWER_SUBSCRIPTIONS = 10
+VIEWER_CART_SIZE = 10
+VIEWER_RECIPES = 5
+PNG_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAA'
+    'ADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+# Допустимое число SQL-запросов на один вызов. Не должно зависеть
+# от размера данных: рост означает N+1 или потерянный prefetch.
+QUERY_BUDGETS = {
+    'recipe_list_anonymous': 6,
+    'recipe_list_authenticated': 7,
+    'recipe_list_filtered': 8,
+    'recipe_detail': 7,
+    'recipe_create': 24,
+    'recipe_update': 22,
+    'subscriptions': 5,
+    'ingredient_search': 2,
+    'download_shopping_cart': 4,
+}
+
+
+def build_dataset(size):
+    """ Набор данных из size рецептов и наблюдателя viewer, который
+    подписан на авторов, держит рецепты в избранном и корзине. """
+    authors_count = max(size // RECIPES_PER_AUTHOR, VIEWER_SUBSCRIPTIONS)
+    users = CustomUser.objects.bulk_create(
+        CustomUser(username=f'bench{number}',
+                   email=f'bench{number}@example.com',
+                   first_name='Имя', last_name='Фамилия',
+                   password='!')
+        for number in range(authors_count + 1)
+    )
+    viewer, authors = users[0], users[1:]
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}',
+            slug=f'tag{number}')
+        for number in range(5)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'{word} {number}', measurement_unit='г')
+        for number in range(20) for word in INGREDIENT_WORDS
+    )
+    recipe_authors = cycle(authors)
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=viewer if number < VIEWER_RECIPES
+               else next(recipe_authors),
+               name=f'Рецепт {number}', text='Описание рецепта',
+               cooking_time=number % 120 + 1, image='recipes/benchmark.png')
+        for number in range(size)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.pk,
+                            tag_id=tags[number % len(tags)].pk)
+        for number, recipe in enumerate(recipes)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(number + offset) % len(ingredients)],
+            amount=offset + 1)
+        for number, recipe in enumerate(recipes)
+        for offset in range(INGREDIENTS_PER_RECIPE)
+    )
+    AuthorSubscription.objects.bulk_create(
+        AuthorSubscription(subscriber=viewer, author=author)
+        for author in authors[:VIEWER_SUBSCRIPTIONS]
+    )
+    viewer_recipes = recipes[-VIEWER_CART_SIZE:]
+    Favorite.objects.bulk_create(
+        Favorite(user=viewer, recipe=recipe) for recipe in viewer_recipes)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=viewer, recipe=recipe) for recipe in viewer_recipes)
+    shopping_list.rebuild()
+    counters.reconcile()
+    feed.rebuild_timeline(viewer.pk)
+    return {
+        'viewer': viewer,
+        'author': authors[0],
+        'tag': tags[0],
+        'ingredients': ingredients,
+        'recipe': recipes[-1],
+        'own_recipe': recipes[0],
+    }
+
+
+def get_scenarios(data):
+    """ Сценарии: имя, метод, адрес, тело и нужна ли авторизация. """
+    tag_ids = [data['tag'].pk]
+    ingredient_ids = [ingredient.pk for ingredient in data['ingredients']]
+    amounts = cycle(range(1, 100))
+    own_recipe = data['own_recipe']
+
+    def create_payload():
+        return {
+            'name': 'Новый рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': PNG_IMAGE, 'tags': tag_ids,
+            'ingredients': [{'id': pk, 'amount': next(amounts)}
+                            for pk in ingredient_ids[:INGREDIENTS_PER_RECIPE]],
+        }
+
+    def update_payload():
+        return {
+            'name': f'Рецепт {next(amounts)}',
+            'ingredients': [{'id': pk, 'amount': next(amounts)}
+                            for pk in ingredient_ids[:INGREDIENTS_PER_RECIPE]],
+        }
+
+    return (
+        ('recipe_list_anonymous', 'get', '/api/recipes/', None, False),
+        ('recipe_list_authenticated', 'get', '/api/recipes/?limit=20',
+         None, True),
+        ('recipe_list_filtered', 'get',
+         f'/api/recipes/?tags={data["tag"].slug}&is_favorited=1'
+         f'&author={data["author"].pk}&author={data["viewer"].pk}',
+         None, True),
+        ('recipe_detail', 'get', f'/api/recipes/{data["recipe"].pk}/',
+         None, True),
+        ('recipe_create', 'post', '/api/recipes/', create_payload, True),
+        ('recipe_update', 'patch', f'/api/recipes/{own_recipe.pk}/',
+         update_payload, True),
+        ('subscriptions', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', None, True),
+        ('ingredient_search', 'get', '/api/ingredients/?name=са',
+         None, False),
+        ('download_shopping_cart', 'get',
+         '/api/recipes/download_shopping_cart/', None, True),
+    )
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеры задержек и числа SQL-запросов основных эндпоинтов API '
+            'на наборах данных разного размера во временной базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+            help='Количество рецептов в наборах данных.')
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Количество запросов на сценарий.')
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Файл для JSON-отчета.')
+        parser.add_argument(
+            '--compare',
+            help='Предыдущий отчет для сравнения задержек и запросов.')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as report_file:
+                previous = json.load(report_file)
+
+        connection.settings_dict['TEST']['MIGRATE'] = False
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'benchmark',
+            }}):
+                results = {
+                    str(size): self.run_size(size, options['iterations'])
+                    for size in options['sizes']
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'commit': get_git_commit(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'sizes': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Отчет сохранен в {options["output"]}.')
+
+        if previous is not None:
+            self.compare(previous, report)
+        failures = [
+            f'{size}/{name}: {result["queries"]} > {result["query_budget"]}'
+            for size, scenarios in results.items()
+            for name, result in scenarios.items()
+            if result['queries'] > result['query_budget']
+            or result['errors']
+        ]
+        if failures:
+            raise CommandError(
+                'Превышен лимит запросов или есть ошибки: '
+                + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Все лимиты запросов соблюдены.'))
+
+    def run_size(self, size, iterations):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        data = build_dataset(size)
+        token = Token.objects.create(user=data['viewer'])
+        client = Client()
+        results = {}
+        for name, method, path, payload, auth in get_scenarios(data):
+            headers = {'Authorization': f'Token {token.key}'} if auth else {}
+            latencies, queries, errors = [], 0, 0
+            for _ in range(iterations):
+                kwargs = {'headers': headers}
+                if payload is not None:
+                    kwargs.update(data=payload(),
+                                  content_type='application/json')
+                with CaptureQueriesContext(connection) as captured:
+                    started = perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    latencies.append((perf_counter() - started) * 1000)
+                queries = max(queries, len(captured))
+                errors += response.status_code >= 400
+            percentiles = quantiles(latencies, n=100, method='inclusive')
+            results[name] = {
+                'queries': queries,
+                'query_budget': QUERY_BUDGETS[name],
+                'errors': errors,
+                'first_ms': round(latencies[0], 2),
+                'mean_ms': round(mean(latencies), 2),
+                'p50_ms': round(percentiles[49], 2),
+                'p95_ms': round(percentiles[94], 2),
+                'p99_ms': round(percentiles[98], 2),
+            }
+            self.stdout.write(
+                f'{size:>7} {name:<28} запросов {queries:>3} '
+                f'(лимит {QUERY_BUDGETS[name]}), '
+                f'p50 {results[name]["p50_ms"]:.1f} мс, '
+                f'p95 {results[name]["p95_ms"]:.1f} мс'
+                + (f', ошибок {errors}' if errors else '')
+            )
+        return results
+
+    def compare(self, previous, report):
+        """ Печатает изменения задержек и числа запросов
+        относительно предыдущего отчета. """
+        self.stdout.write(
+            f'Сравнение с {previous.get("commit") or "предыдущим отчетом"}:')
+        for size, scenarios in report['sizes'].items():
+            for name, result in scenarios.items():
+                old = previous.get('sizes', {}).get(size, {}).get(name)
+                if old is None:
+                    continue
+                change = (result['p50_ms'] / old['p50_ms'] - 1) * 100 \
+                    if old['p50_ms'] else 0
+                self.stdout.write(
+                    f'{size:>7} {name:<28} p50 {old["p50_ms"]:.1f} -> '
+                    f'{result["p50_ms"]:.1f} мс ({change:+.0f}%), '
+                    f'запросов {old["queries"]} -> {result["queries"]}'
+                )
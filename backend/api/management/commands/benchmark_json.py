@@ -0,0 +1,87 @@
+import io
+import json
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.api_serializers.recipes_serializers import RecipeSerializer
+from api.api_views.parsers import FastJSONParser
+from api.api_views.recipes_views import get_recipe_queryset
+from api.api_views.renderers import FastJSONRenderer, orjson
+from users.models import CustomUser
+
+
+def measure(function, iterations):
+    """ Среднее время вызова в микросекундах. """
+    started = perf_counter()
+    for _ in range(iterations):
+        function()
+    return (perf_counter() - started) / iterations * 1_000_000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает JSONRenderer и JSONParser DRF с FastJSONRenderer '
+            'и FastJSONParser на страницах рецептов из текущей базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limits', type=int, nargs='+', default=[6, 20, 100],
+            help='Размеры страниц рецептов.')
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Количество повторов для каждого замера.')
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого строятся страницы.')
+
+    def handle(self, *args, **options):
+        user = AnonymousUser()
+        if options['user'] is not None:
+            try:
+                user = CustomUser.objects.get(pk=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError('Пользователь не найден.')
+        request = Request(RequestFactory().get('/api/recipes/'))
+        request.user = user
+        iterations = options['iterations']
+        backend = 'orjson' if orjson else 'не установлен, используется json'
+        self.stdout.write(f'Быстрый JSON: {backend}')
+
+        for limit in options['limits']:
+            recipes = list(get_recipe_queryset(user)[:limit])
+            if not recipes:
+                raise CommandError(
+                    'Рецептов нет, сначала выполните manage.py generate_data.')
+            data = {
+                'count': len(recipes),
+                'next': None,
+                'previous': None,
+                'results': RecipeSerializer(
+                    recipes, many=True, context={'request': request}).data,
+            }
+            default_body = JSONRenderer().render(data)
+            fast_body = FastJSONRenderer().render(data)
+            if json.loads(default_body) != json.loads(fast_body):
+                raise CommandError(
+                    f'Ответы рендереров различаются на странице {limit}.')
+
+            render = measure(
+                lambda: JSONRenderer().render(data), iterations)
+            fast_render = measure(
+                lambda: FastJSONRenderer().render(data), iterations)
+            parse = measure(lambda: JSONParser().parse(
+                io.BytesIO(default_body)), iterations)
+            fast_parse = measure(lambda: FastJSONParser().parse(
+                io.BytesIO(default_body)), iterations)
+            self.stdout.write(
+                f'{len(recipes)} рецептов, {len(default_body)} байт: '
+                f'рендер {render:.0f} -> {fast_render:.0f} мкс '
+                f'(x{render / fast_render:.1f}), '
+                f'разбор {parse:.0f} -> {fast_parse:.0f} мкс '
+                f'(x{parse / fast_parse:.1f})')
+        self.stdout.write(self.style.SUCCESS('Замер завершен.'))
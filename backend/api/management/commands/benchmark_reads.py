@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median, quantiles
+from time import perf_counter
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from users.models import CustomUser
+
+ASGI_URLCONF = 'backend.asgi_urls'
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=20',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+)
+USER_PATHS = (
+    '/api/recipes/download_shopping_cart/',
+)
+
+
+def summarize(title, latencies, statuses, elapsed):
+    """ Строка отчета: пропускная способность и задержки в мс. """
+    p95 = (quantiles(latencies, n=20)[-1]
+           if len(latencies) > 1 else latencies[0])
+    errors = sum(status >= 400 for status in statuses)
+    return (
+        f'{title}: {len(latencies)} запросов за {elapsed:.2f} с, '
+        f'{len(latencies) / elapsed:.1f} запр/с, '
+        f'p50 {median(latencies) * 1000:.1f} мс, '
+        f'p95 {p95 * 1000:.1f} мс, ошибок {errors}'
+    )
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность синхронных (WSGI) и '
+            'асинхронных (ASGI) обработчиков чтения при параллельных '
+            'запросах внутри процесса')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество запросов в каждом режиме.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Количество одновременных запросов.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Адрес для запросов, можно указать несколько раз.')
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя, от имени которого идут запросы.')
+
+    def handle(self, *args, **options):
+        paths = list(options['paths'] or DEFAULT_PATHS)
+        headers = {}
+        if options['user'] is not None:
+            try:
+                user = CustomUser.objects.get(pk=options['user'])
+            except CustomUser.DoesNotExist:
+                raise CommandError('Пользователь не найден.')
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['Authorization'] = f'Token {token.key}'
+            if not options['paths']:
+                paths.extend(USER_PATHS)
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        self.run_wsgi(paths, len(paths), 1, headers)
+        self.stdout.write(summarize(
+            'WSGI', *self.run_wsgi(paths, total, concurrency, headers)))
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            async_to_sync(self.run_asgi)(paths, len(paths), 1, headers)
+            self.stdout.write(summarize('ASGI', *async_to_sync(
+                self.run_asgi)(paths, total, concurrency, headers)))
+
+    def run_wsgi(self, paths, total, concurrency, headers):
+        local = threading.local()
+
+        def fetch(number):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = perf_counter()
+            response = local.client.get(
+                paths[number % len(paths)], headers=headers)
+            return perf_counter() - started, response.status_code
+
+        started = perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = perf_counter() - started
+        return [r[0] for r in results], [r[1] for r in results], elapsed
+
+    async def run_asgi(self, paths, total, concurrency, headers):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(number):
+            async with semaphore:
+                started = perf_counter()
+                response = await client.get(
+                    paths[number % len(paths)], headers=headers)
+                return perf_counter() - started, response.status_code
+
+        started = perf_counter()
+        results = await asyncio.gather(*map(fetch, range(total)))
+        elapsed = perf_counter() - started
+        return [r[0] for r in results], [r[1] for r in results], elapsed
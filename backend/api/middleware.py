@@ -0,0 +1,195 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+current_metrics = ContextVar('request_metrics', default=None)
+SQL_LOG_LENGTH = 300
+
+
+class RequestMetrics:
+    """ Замеры одного запроса: SQL, сериализация и представление.
+    Запросы к БД передает экземпляру record_query. """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.view_started = None
+        self.finished = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.statements = Counter()
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            self.statements[sql] += 1
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                self.slow_queries.append((duration, sql))
+
+    def finish(self):
+        self.finished = perf_counter()
+
+    @property
+    def total_time(self):
+        return self.finished - self.started
+
+    @property
+    def view_time(self):
+        if self.view_started is None:
+            return 0.0
+        return self.finished - self.view_started
+
+    def get_duplicates(self):
+        """ Запросы, повторенные в запросе не меньше
+        DUPLICATE_QUERY_THRESHOLD раз, — признак N+1. """
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= settings.DUPLICATE_QUERY_THRESHOLD
+        ]
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'serializer_ms': round(self.serializer_time * 1000, 1),
+            'view_ms': round(self.view_time * 1000, 1),
+            'total_ms': round(self.total_time * 1000, 1),
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """ execute_wrapper соединений: передает запрос замерам текущего
+    HTTP-запроса, если они ведутся. Замеры хранятся в ContextVar,
+    поэтому запросы асинхронного ORM из потоков sync_to_async
+    учитываются так же, как синхронные. """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    """ Учитывает время блока как время сериализации запроса.
+    Вложенные блоки учитываются один раз, во внешнем. """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializer_depth:
+        yield
+        return
+    metrics.serializer_depth += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += perf_counter() - started
+        metrics.serializer_depth -= 1
+
+
+class SerializerTimingMixin:
+    """ Учитывает to_representation сериализатора в замерах запроса.
+    Подключается к сериализаторам проекта явно. """
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+def log_metrics(request, response, metrics):
+    data = metrics.as_dict()
+    extra = {'request_metrics': {
+        'method': request.method, 'path': request.path,
+        'status': response.status_code, **data}}
+    message = ' '.join(f'{key}={value}' for key, value in data.items())
+    logger.info('%s %s status=%s %s', request.method, request.path,
+                response.status_code, message, extra=extra)
+    if data['total_ms'] >= settings.SLOW_REQUEST_MS:
+        logger.warning('slow request %s %s %s', request.method,
+                       request.path, message, extra=extra)
+    for duration, sql in metrics.slow_queries:
+        logger.warning('slow query %s %s duration_ms=%.1f sql=%s',
+                       request.method, request.path, duration * 1000,
+                       sql[:SQL_LOG_LENGTH], extra=extra)
+    for sql, count in metrics.get_duplicates():
+        logger.warning('duplicate query %s %s count=%s sql=%s',
+                       request.method, request.path, count,
+                       sql[:SQL_LOG_LENGTH], extra=extra)
+
+
+class RequestMetricsMiddleware:
+    """ Считает запросы к БД и время БД, сериализации и представления.
+    Итог отдается в заголовке Server-Timing и пишется в лог; медленные
+    запросы и повторяющийся SQL логируются предупреждениями.
+    Работает и в синхронном, и в асинхронном стеке: под ASGI запрос
+    не переключается в поток ради замеров. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = metrics.server_timing()
+        log_metrics(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_metrics.get().view_started = perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        current_metrics.get().view_started = perf_counter()
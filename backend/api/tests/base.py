@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import counters, feed
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import AuthorSubscription, CustomUser
+
+PNG_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAA'
+    'ADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+INGREDIENT_NAMES = ('Сахар', 'Соль', 'Сметана', 'Мука', 'Молоко')
+
+
+def create_user(username):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='Pass-word-1', first_name='Имя', last_name='Фамилия')
+
+
+def create_recipe(author, name, tags, ingredients):
+    """ Рецепт с тегами и ингредиентами: ingredients - пары
+    (ингредиент, количество). """
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание',
+        cooking_time=10, image='recipes/test.png')
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients)
+    return recipe
+
+
+class APITestCase(TestCase):
+    """ Общий набор данных: viewer подписан на author, держит два его
+    рецепта в корзине и один в избранном. У author три рецепта,
+    у other - два, у viewer - один. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user('viewer')
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+        cls.token = Token.objects.create(user=cls.viewer)
+        cls.breakfast = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        cls.dinner = Tag.objects.create(
+            name='Ужин', color='#49B64E', slug='dinner')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in INGREDIENT_NAMES)
+        sugar, salt, sour_cream, flour, milk = cls.ingredients
+        cls.recipes = [
+            create_recipe(cls.author, 'Блины', [cls.breakfast],
+                          [(flour, 200), (milk, 300), (sugar, 20)]),
+            create_recipe(cls.author, 'Сырники', [cls.breakfast],
+                          [(flour, 50), (sour_cream, 100), (sugar, 30)]),
+            create_recipe(cls.author, 'Суп', [cls.dinner],
+                          [(salt, 5), (sour_cream, 50)]),
+            create_recipe(cls.other, 'Каша', [cls.breakfast, cls.dinner],
+                          [(milk, 250), (salt, 2)]),
+            create_recipe(cls.other, 'Хлеб', [cls.dinner],
+                          [(flour, 500), (salt, 10)]),
+            create_recipe(cls.viewer, 'Оладьи', [cls.breakfast],
+                          [(flour, 150), (milk, 150)]),
+        ]
+        cls.pancakes, cls.syrniki, cls.soup = cls.recipes[:3]
+        with cls.captureOnCommitCallbacks(execute=True):
+            AuthorSubscription.objects.create(
+                subscriber=cls.viewer, author=cls.author)
+        Favorite.objects.create(user=cls.viewer, recipe=cls.pancakes)
+        ShoppingCart.objects.create(user=cls.viewer, recipe=cls.pancakes)
+        ShoppingCart.objects.create(user=cls.viewer, recipe=cls.syrniki)
+        counters.reconcile()
+        feed.rebuild_timeline(cls.viewer.pk)
+
+    def setUp(self):
+        # Метки версий и кеши живут в LocMemCache и переживают откат
+        # транзакции теста, поэтому каждый тест начинает с пустого кеша.
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
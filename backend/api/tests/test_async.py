@@ -0,0 +1,96 @@
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import resolve
+
+from api.api_views import async_views
+from backend.asgi import application
+
+from .base import APITestCase
+
+
+@override_settings(ROOT_URLCONF='backend.asgi_urls')
+class AsyncReadTests(APITestCase):
+    """ Асинхронные представления отдают то же, что синхронные. """
+
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    async def assertSameAsSync(self, path, **params):
+        expected = await self.async_client.get(
+            path, params, headers=self.headers)
+        response = await sync_to_async(self.client.get)(path, params)
+        self.assertEqual(expected.status_code, response.status_code)
+        self.assertEqual(json.loads(expected.content),
+                         json.loads(response.content))
+        return expected
+
+    async def test_recipes(self):
+        for params in ({}, {'limit': 2, 'page': 2}, {'tags': 'dinner'},
+                       {'is_in_shopping_cart': 1}, {'search': 'суп'},
+                       {'fields': 'id,name'}, {'cursor': ''},
+                       {'ordering': '-favorites_count'},
+                       {'cursor': '', 'ordering': '-favorites_count'},
+                       {'cursor': '', 'search': 'суп'}):
+            with self.subTest(params=params):
+                await self.assertSameAsSync('/api/recipes/', **params)
+
+    async def test_recipe_detail(self):
+        await self.assertSameAsSync(f'/api/recipes/{self.pancakes.pk}/')
+        response = await self.assertSameAsSync('/api/recipes/0/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_reference_lists(self):
+        await self.assertSameAsSync('/api/tags/')
+        await self.assertSameAsSync('/api/ingredients/', name='м')
+
+    async def test_not_modified(self):
+        response = await self.async_client.get(
+            '/api/recipes/', headers=self.headers)
+        response = await self.async_client.get(
+            '/api/recipes/', headers={
+                **self.headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_download_shopping_cart(self):
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_download_shopping_cart_stream(self):
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'csv'},
+            headers=self.headers)
+        content = b''.join([
+            chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('Мука,250,г', content)
+        response = await self.async_client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'xls'},
+            headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_bad_filter(self):
+        response = await self.assertSameAsSync('/api/recipes/', tags='nope')
+        self.assertEqual(response.status_code, 400)
+
+
+class ASGIApplicationTests(SimpleTestCase):
+    """ Асинхронные обработчики подключаются для запросов через
+    backend.asgi, ROOT_URLCONF при этом не меняется. """
+
+    def test_async_urlconf(self):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/tags/',
+                 'query_string': b'', 'headers': []}
+        request, _ = application.create_request(scope, io.BytesIO())
+        self.assertIs(
+            resolve(request.path_info, request.urlconf).func,
+            async_views.tag_list)
+        self.assertIsNot(resolve('/api/tags/').func, async_views.tag_list)
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark_api import (QUERY_BUDGETS,
+                                                   build_dataset,
+                                                   get_scenarios)
+
+
+class BenchmarkScenarioTests(TestCase):
+    """ Сценарии benchmark_api укладываются в свои лимиты запросов
+    на наборах данных разного размера. """
+
+    def run_scenarios(self, size):
+        data = build_dataset(size)
+        token = Token.objects.create(user=data['viewer'])
+        for name, method, path, payload, auth in get_scenarios(data):
+            headers = {'Authorization': f'Token {token.key}'} if auth else {}
+            kwargs = {'headers': headers}
+            if payload is not None:
+                kwargs.update(data=payload(), content_type='application/json')
+            with self.subTest(size=size, scenario=name):
+                with (self.captureOnCommitCallbacks(execute=True),
+                      CaptureQueriesContext(connection) as captured):
+                    response = getattr(self.client, method)(path, **kwargs)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(len(captured), QUERY_BUDGETS[name])
+
+    def test_small_dataset(self):
+        cache.clear()
+        self.run_scenarios(20)
+
+    def test_larger_dataset(self):
+        cache.clear()
+        self.run_scenarios(200)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from recipes.models import TimelineEntry
+from users.models import AuthorSubscription
+
+from .base import APITestCase, create_recipe
+
+FEED_URL = '/api/recipes/feed/'
+
+
+class FeedTests(APITestCase):
+
+    def get_feed_names(self):
+        response = self.client.get(FEED_URL, {'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_feed(self):
+        with self.assertNumQueries(7):
+            response = self.client.get(FEED_URL)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data['results']],
+            ['Суп', 'Сырники', 'Блины'])
+
+    def test_popular_authors_refreshed_after_response(self):
+        # Кеш перед тестом пуст: множество популярных авторов
+        # пересчитывается после ответа, а не в запросе.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.get_feed_names()
+        self.assertEqual(len(callbacks), 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.get_feed_names()
+        self.assertEqual(callbacks, [])
+
+    def test_new_recipe_delivered_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_recipe(self.author, 'Омлет', [self.breakfast],
+                          [(self.ingredients[4], 100)])
+        self.assertNotIn('Омлет', self.get_feed_names())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get_feed_names()[0], 'Омлет')
+
+    def test_subscribe_and_unsubscribe(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            subscription = AuthorSubscription.objects.create(
+                subscriber=self.viewer, author=self.other)
+        self.assertEqual(
+            set(self.get_feed_names()), {'Блины', 'Сырники', 'Суп'})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            set(self.get_feed_names()),
+            {'Блины', 'Сырники', 'Суп', 'Каша', 'Хлеб'})
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.delete()
+        self.assertEqual(
+            set(self.get_feed_names()), {'Блины', 'Сырники', 'Суп'})
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_authors_read_on_request(self):
+        call_command('timelines', authors_only=True, stdout=StringIO())
+        TimelineEntry.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, 'Омлет', [self.breakfast],
+                          [(self.ingredients[4], 100)])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            self.get_feed_names(), ['Омлет', 'Суп', 'Сырники', 'Блины'])
+
+    @override_settings(FEED_TIMELINE_LENGTH=2)
+    def test_timeline_trimmed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AuthorSubscription.objects.create(
+                subscriber=self.viewer, author=self.other)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.viewer).count(), 2)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.anonymous.get(FEED_URL).status_code, 401)
+
+    def test_rebuild_command(self):
+        TimelineEntry.objects.all().delete()
+        call_command('timelines', stdout=StringIO())
+        self.assertEqual(
+            self.get_feed_names(), ['Суп', 'Сырники', 'Блины'])
@@ -0,0 +1,69 @@
+import json
+from base64 import b64decode
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from recipes.images import ImageProcessingTimeout
+from recipes.models import Recipe
+
+from .base import PNG_IMAGE, APITestCase
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeImageTests(APITestCase):
+
+    def get_form(self, image):
+        return {
+            'name': 'Омлет',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'tags': [self.breakfast.pk],
+            'ingredients': json.dumps(
+                [{'id': self.ingredients[4].pk, 'amount': 100}]),
+            'image': image,
+        }
+
+    def test_base64_upload_variants(self):
+        response = self.client.post(RECIPES_URL, {
+            **self.get_form(PNG_IMAGE),
+            'ingredients': [{'id': self.ingredients[4].pk, 'amount': 100}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(name='Омлет')
+        self.assertRegex(recipe.image.name, r'^recipes/[0-9a-f-]{36}\.png$')
+        self.assertTrue(recipe.image_thumbnail.name.endswith('.webp'))
+        self.assertTrue(recipe.image_medium.name.endswith('.webp'))
+        response = self.anonymous.get(RECIPES_URL)
+        self.assertTrue(
+            response.data['results'][0]['image'].endswith('_medium.webp'))
+
+    def test_multipart_upload_renamed(self):
+        image = SimpleUploadedFile(
+            '../../secret name.png', b64decode(PNG_IMAGE.split(',')[1]),
+            content_type='image/png')
+        response = self.client.post(
+            RECIPES_URL, self.get_form(image), format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(name='Омлет')
+        self.assertTrue(recipe.image_thumbnail.name.endswith('.webp'))
+
+    def test_multipart_rejects_non_image(self):
+        image = SimpleUploadedFile(
+            'recipe.png', b'not an image', content_type='image/png')
+        response = self.client.post(
+            RECIPES_URL, self.get_form(image), format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_processing_timeout(self):
+        with mock.patch('recipes.images.run_in_pool',
+                        side_effect=ImageProcessingTimeout):
+            response = self.client.post(RECIPES_URL, {
+                **self.get_form(PNG_IMAGE),
+                'ingredients': [
+                    {'id': self.ingredients[4].pk, 'amount': 100}],
+            }, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Recipe.objects.filter(name='Омлет').exists())
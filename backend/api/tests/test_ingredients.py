@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+from .base import APITestCase
+
+INGREDIENTS_URL = '/api/ingredients/'
+
+
+class IngredientSearchTests(APITestCase):
+
+    def get_names(self, **params):
+        response = self.anonymous.get(INGREDIENTS_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.get_names(), sorted(self.get_names()))
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(INGREDIENTS_URL, {'name': 'см'})
+        self.assertEqual(
+            [item['name'] for item in response.data], ['Сметана'])
+        self.assertEqual(
+            self.get_names(name='С'), ['Сахар', 'Сметана', 'Соль'])
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(self.get_names(name='с'), ['Сахар', 'Сметана'])
+
+    def test_index_rebuilt_after_change(self):
+        self.get_names()
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Сода', measurement_unit='г')
+        self.assertEqual(self.get_names(name='со'), ['Сода', 'Соль'])
+
+    def test_not_modified(self):
+        etag = self.anonymous.get(INGREDIENTS_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(
+                INGREDIENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Сода', measurement_unit='г')
+        response = self.anonymous.get(
+            INGREDIENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_rebuild_skips_thread_lock(self):
+        # Блокировку держит поток, читающий базу: цикл событий
+        # не должен ее ждать.
+        with mock.patch.object(ingredient_index, '_lock') as lock:
+            lock.__enter__.side_effect = AssertionError('lock taken')
+            items = await ingredient_index.asearch('См')
+        self.assertEqual([item['name'] for item in items], ['Сметана'])
@@ -0,0 +1,69 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, override_settings
+
+from api.middleware import record_query
+
+from .base import APITestCase
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(?P<queries>\d+) queries", '
+    r'serializer;dur=(?P<serializer>[\d.]+), '
+    r'view;dur=[\d.]+, total;dur=[\d.]+')
+
+
+class RequestMetricsTests(APITestCase):
+
+    def get_timing(self, response):
+        match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        return int(match['queries']), float(match['serializer'])
+
+    def test_server_timing(self):
+        with self.assertNumQueries(7) as captured:
+            response = self.client.get('/api/recipes/')
+        queries, serializer_ms = self.get_timing(response)
+        self.assertEqual(queries, len(captured))
+        self.assertGreater(serializer_ms, 0)
+
+    def test_not_modified_has_no_queries(self):
+        etag = self.anonymous.get('/api/tags/')['ETag']
+        response = self.anonymous.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self.get_timing(response), (0, 0.0))
+
+    def test_recorder_installed_once(self):
+        self.client.get('/api/tags/')
+        self.client.get('/api/tags/')
+        self.assertEqual(connection.execute_wrappers.count(record_query), 1)
+
+    @override_settings(SLOW_REQUEST_MS=0, DUPLICATE_QUERY_THRESHOLD=1)
+    def test_warnings(self):
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            self.anonymous.get('/api/tags/')
+        messages = '\n'.join(logs.output)
+        self.assertIn('slow request GET /api/tags/', messages)
+        self.assertIn('duplicate query GET /api/tags/', messages)
+
+    @override_settings(ROOT_URLCONF='backend.asgi_urls')
+    async def test_async_view(self):
+        # Запросы асинхронного ORM выполняются в потоках sync_to_async
+        # и учитываются так же, как в синхронном представлении.
+        sync_queries, _ = self.get_timing(
+            await sync_to_async(self.anonymous.get)('/api/recipes/'))
+        await sync_to_async(cache.clear)()
+        response = await AsyncClient().get('/api/recipes/')
+        queries, serializer_ms = self.get_timing(response)
+        self.assertEqual(queries, sync_queries)
+        self.assertGreater(serializer_ms, 0)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_disabled(self):
+        self.assertNotIn('Server-Timing', self.anonymous.get('/api/tags/'))
+
+    async def test_sync_view_under_asgi(self):
+        response = await AsyncClient().get('/api/users/')
+        queries, _ = self.get_timing(response)
+        self.assertEqual(queries, 2)
@@ -0,0 +1,98 @@
+from base64 import b64encode
+from urllib.parse import parse_qs, urlparse
+
+from recipes import counters
+from recipes.models import Favorite
+
+from .base import APITestCase
+
+RECIPES_URL = '/api/recipes/'
+
+
+class CursorPaginationTests(APITestCase):
+
+    def walk(self, params, queries=6):
+        """ Проходит все страницы по ссылкам next и возвращает
+        названия рецептов. Число запросов на страницу постоянно. """
+        names = []
+        params = {'cursor': '', 'limit': 2, **params}
+        while True:
+            with self.assertNumQueries(queries):
+                response = self.client.get(RECIPES_URL, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertNotIn('count', response.data)
+            names.extend(item['name'] for item in response.data['results'])
+            if response.data['next'] is None:
+                return names
+            params = {
+                name: values[0] for name, values in parse_qs(
+                    urlparse(response.data['next']).query).items()}
+
+    def test_walks_all_pages_by_date(self):
+        names = self.walk({})
+        self.assertEqual(
+            names, [recipe.name for recipe in reversed(self.recipes)])
+
+    def test_filters_apply(self):
+        # Фильтр по тегу добавляет запрос допустимых значений.
+        self.assertEqual(self.walk({'tags': 'dinner'}, queries=7),
+                         ['Хлеб', 'Каша', 'Суп'])
+
+    def test_no_count_query(self):
+        with self.assertNumQueries(6) as captured:
+            self.client.get(RECIPES_URL, {'cursor': ''})
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in captured))
+
+    def test_cursor_keyed_on_ordering(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=self.soup)
+            for user in (self.author, self.other))
+        counters.reconcile()
+        names = self.walk({'ordering': '-favorites_count'})
+        self.assertEqual(names[:2], ['Суп', 'Блины'])
+        self.assertEqual(
+            sorted(names), sorted(recipe.name for recipe in self.recipes))
+
+    def test_sparse_fields_load_cursor_keys(self):
+        Favorite.objects.create(user=self.author, recipe=self.soup)
+        counters.reconcile()
+        names = self.walk(
+            {'ordering': '-favorites_count', 'fields': 'id,name'}, queries=4)
+        self.assertEqual(names[0], 'Суп')
+        self.assertEqual(len(names), len(self.recipes))
+
+    def test_search_uses_page_numbers(self):
+        # Ранг поиска не годится для ключа курсора.
+        response = self.client.get(
+            RECIPES_URL, {'cursor': '', 'search': 'суп', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['Суп'])
+
+    def test_cursor_from_other_ordering_rejected(self):
+        response = self.client.get(RECIPES_URL, {'cursor': '', 'limit': 2})
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        response = self.client.get(RECIPES_URL, {
+            'cursor': cursor, 'ordering': '-favorites_count'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-base64', b64encode(b'[1, 2]').decode()):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(RECIPES_URL, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_accept_header_switches_mode(self):
+        response = self.client.get(
+            RECIPES_URL, HTTP_ACCEPT='application/json; pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+
+    def test_page_number_mode_by_default(self):
+        response = self.client.get(RECIPES_URL, {'limit': 2, 'page': 2})
+        self.assertEqual(response.data['count'], len(self.recipes))
+        self.assertEqual(
+            [item['name'] for item in response.data['results']],
+            ['Каша', 'Суп'])
@@ -0,0 +1,306 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes import counters
+from recipes.models import (Favorite, RecipeIngredient,
+                            ShoppingCartIngredient)
+
+from .base import PNG_IMAGE, APITestCase, create_recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeListTests(APITestCase):
+
+    def test_anonymous_list(self):
+        with self.assertNumQueries(6):
+            response = self.anonymous.get(RECIPES_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.recipes))
+        recipe = response.data['results'][0]
+        self.assertEqual(recipe['name'], 'Оладьи')
+        self.assertFalse(recipe['is_favorited'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+
+    def test_authenticated_list_flags(self):
+        with self.assertNumQueries(7):
+            response = self.client.get(RECIPES_URL)
+        results = {item['name']: item for item in response.data['results']}
+        self.assertTrue(results['Блины']['is_favorited'])
+        self.assertTrue(results['Блины']['is_in_shopping_cart'])
+        self.assertTrue(results['Сырники']['is_in_shopping_cart'])
+        self.assertFalse(results['Сырники']['is_favorited'])
+        self.assertTrue(results['Суп']['author']['is_subscribed'])
+        self.assertFalse(results['Каша']['author']['is_subscribed'])
+        self.assertEqual(results['Блины']['favorites_count'], 1)
+        self.assertEqual(results['Сырники']['in_carts_count'], 1)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(7):
+            self.client.get(RECIPES_URL, {'page': 1})
+        for number in range(6):
+            create_recipe(self.other, f'Рецепт {number}', [self.dinner],
+                          [(self.ingredients[1], 1)])
+        with self.assertNumQueries(7):
+            response = self.client.get(RECIPES_URL, {'page': 1})
+        self.assertEqual(response.data['results'][0]['name'], 'Рецепт 5')
+
+    def test_filters(self):
+        with self.assertNumQueries(9):
+            response = self.client.get(
+                RECIPES_URL, {'tags': 'dinner', 'author': self.author.pk})
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['Суп'])
+        response = self.client.get(RECIPES_URL, {'is_favorited': 1})
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['Блины'])
+        response = self.client.get(RECIPES_URL, {'is_in_shopping_cart': 1})
+        self.assertEqual(
+            {item['name'] for item in response.data['results']},
+            {'Блины', 'Сырники'})
+
+    def test_detail(self):
+        with self.assertNumQueries(6):
+            response = self.client.get(f'{RECIPES_URL}{self.pancakes.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertEqual(
+            {item['name']: item['amount']
+             for item in response.data['ingredients']},
+            {'Мука': 200, 'Молоко': 300, 'Сахар': 20})
+
+    def test_ordering_by_counters(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=self.soup)
+            for user in (self.author, self.other))
+        counters.reconcile()
+        response = self.anonymous.get(
+            RECIPES_URL, {'ordering': '-favorites_count'})
+        self.assertEqual(
+            [item['name'] for item in response.data['results'][:2]],
+            ['Суп', 'Блины'])
+
+    def test_favorite(self):
+        url = f'{RECIPES_URL}{self.soup.pk}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.favorites_count, 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.favorites_count, 0)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def test_not_modified_without_queries(self):
+        response = self.anonymous.get(RECIPES_URL)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(
+                RECIPES_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_for_viewer(self):
+        response = self.client.get(RECIPES_URL)
+        self.assertIn('Authorization', response['Vary'])
+        # Единственный запрос - проверка токена.
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                RECIPES_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_viewer(self):
+        etag = self.client.get(RECIPES_URL)['ETag']
+        self.assertNotEqual(self.anonymous.get(RECIPES_URL)['ETag'], etag)
+
+    def test_recipe_change_resets_etags(self):
+        url = f'{RECIPES_URL}{self.soup.pk}/'
+        etags = {path: self.anonymous.get(path)['ETag']
+                 for path in (RECIPES_URL, url)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.name = 'Борщ'
+            self.soup.save()
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.anonymous.get(
+                    path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_ingredient_row_change_resets_etags(self):
+        url = f'{RECIPES_URL}{self.soup.pk}/'
+        etag = self.anonymous.get(url)['ETag']
+        row = self.soup.ingredients_list.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            row.amount += 1
+            row.save()
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(row.amount, [
+            item['amount'] for item in response.data['ingredients']])
+
+    def test_favorite_resets_only_that_recipe(self):
+        list_etag = self.anonymous.get(RECIPES_URL)['ETag']
+        soup_url = f'{RECIPES_URL}{self.soup.pk}/'
+        pancakes_url = f'{RECIPES_URL}{self.pancakes.pk}/'
+        soup_etag = self.anonymous.get(soup_url)['ETag']
+        pancakes_etag = self.anonymous.get(pancakes_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{soup_url}favorite/')
+
+        response = self.anonymous.get(soup_url, HTTP_IF_NONE_MATCH=soup_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['favorites_count'], 1)
+        for url, etag in ((pancakes_url, pancakes_etag),
+                          (RECIPES_URL, list_etag)):
+            with self.subTest(url=url):
+                response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+
+class FragmentCacheTests(APITestCase):
+
+    def test_cached_fragments_skip_prefetch(self):
+        self.client.get(RECIPES_URL)
+        with self.assertNumQueries(5):
+            response = self.client.get(RECIPES_URL, {'page': 1})
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_viewer_flags_not_cached(self):
+        self.client.get(RECIPES_URL)
+        response = self.anonymous.get(f'{RECIPES_URL}{self.pancakes.pk}/')
+        self.assertFalse(response.data['is_favorited'])
+        self.assertFalse(response.data['author']['is_subscribed'])
+        response = self.client.get(f'{RECIPES_URL}{self.pancakes.pk}/')
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+    def test_author_change_invalidates(self):
+        self.anonymous.get(RECIPES_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Автор'
+            self.author.save()
+        response = self.anonymous.get(f'{RECIPES_URL}{self.soup.pk}/')
+        self.assertEqual(response.data['author']['first_name'], 'Автор')
+
+
+class SparseFieldsTests(APITestCase):
+
+    def test_fields(self):
+        with self.assertNumQueries(5) as queries:
+            response = self.client.get(
+                RECIPES_URL, {'fields': 'id,name,cooking_time'})
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'name', 'cooking_time'})
+        recipes_sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"text"', recipes_sql)
+        self.assertNotIn('EXISTS', recipes_sql)
+
+    def test_omit(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                f'{RECIPES_URL}{self.pancakes.pk}/',
+                {'omit': 'ingredients,author,text'})
+        self.assertNotIn('ingredients', response.data)
+        self.assertNotIn('author', response.data)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_unknown_field(self):
+        response = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+
+class RecipeChangeTests(APITestCase):
+
+    def get_payload(self, **kwargs):
+        flour, milk = self.ingredients[3], self.ingredients[4]
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': PNG_IMAGE,
+            'tags': [self.breakfast.pk],
+            'ingredients': [{'id': flour.pk, 'amount': 100},
+                            {'id': milk.pk, 'amount': 200}],
+            **kwargs,
+        }
+
+    def test_create(self):
+        with (self.captureOnCommitCallbacks(execute=True),
+              self.assertNumQueries(14)):
+            response = self.client.post(
+                RECIPES_URL, self.get_payload(), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = self.viewer.recipes.get(name='Новый рецепт')
+        self.assertEqual(recipe.ingredients_list.count(), 2)
+
+    def test_create_rejects_duplicate_ingredients(self):
+        flour = self.ingredients[3]
+        response = self.client.post(RECIPES_URL, self.get_payload(
+            ingredients=[{'id': flour.pk, 'amount': 1},
+                         {'id': flour.pk, 'amount': 2}]), format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_changes_only_differing_rows(self):
+        recipe = self.syrniki
+        sugar, flour, sour_cream = (
+            self.ingredients[0], self.ingredients[3], self.ingredients[2])
+        rows = dict(recipe.ingredients_list.values_list(
+            'ingredient_id', 'pk'))
+        with (self.captureOnCommitCallbacks(execute=True),
+              self.assertNumQueries(22)):
+            response = self.client.patch(
+                f'{RECIPES_URL}{recipe.pk}/',
+                {'ingredients': [{'id': flour.pk, 'amount': 50},
+                                 {'id': sour_cream.pk, 'amount': 150},
+                                 {'id': self.ingredients[4].pk,
+                                  'amount': 70}]},
+                format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        updated = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)}
+        self.assertEqual(updated[flour.pk].pk, rows[flour.pk])
+        self.assertEqual(updated[sour_cream.pk].pk, rows[sour_cream.pk])
+        self.assertEqual(updated[sour_cream.pk].amount, 150)
+        self.assertNotIn(sugar.pk, updated)
+        self.assertEqual(updated[self.ingredients[4].pk].amount, 70)
+
+        totals = dict(ShoppingCartIngredient.objects.filter(
+            user=self.viewer).values_list('ingredient_id', 'total_amount'))
+        self.assertEqual(totals[sugar.pk], 20)
+        self.assertEqual(totals[sour_cream.pk], 150)
+        self.assertEqual(totals[self.ingredients[4].pk], 370)
+
+    def test_unchanged_update_writes_nothing(self):
+        recipe = self.soup
+        ingredients = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in recipe.ingredients_list.values_list(
+                'ingredient_id', 'amount')]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'{RECIPES_URL}{recipe.pk}/',
+                {'name': recipe.name, 'ingredients': ingredients},
+                format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        writes = [query['sql'] for query in queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'authtoken' not in query['sql']]
+        self.assertEqual(writes, [])
+
+    def test_partial_update_keeps_ingredients(self):
+        response = self.client.patch(
+            f'{RECIPES_URL}{self.soup.pk}/', {'cooking_time': 30},
+            format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.soup.ingredients_list.count(), 2)
+
+    def test_delete_updates_shopping_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'{RECIPES_URL}{self.syrniki.pk}/')
+        self.assertEqual(response.status_code, 204)
+        totals = dict(ShoppingCartIngredient.objects.filter(
+            user=self.viewer).values_list('ingredient__name', 'total_amount'))
+        self.assertEqual(totals, {'Мука': 200, 'Молоко': 300, 'Сахар': 20})
@@ -0,0 +1,53 @@
+import gzip
+import json
+
+from recipes.models import Ingredient
+
+from .base import APITestCase
+
+REFERENCE_URL = '/api/reference/'
+
+
+class ReferenceTests(APITestCase):
+
+    def test_bundle(self):
+        with self.assertNumQueries(2):
+            response = self.anonymous.get(REFERENCE_URL)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['version'], response['ETag'].strip('"'))
+        self.assertEqual(
+            [tag['slug'] for tag in data['tags']], ['breakfast', 'dinner'])
+        self.assertEqual(len(data['ingredients']), len(self.ingredients))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(
+                REFERENCE_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip(self):
+        plain = self.anonymous.get(REFERENCE_URL)
+        response = self.anonymous.get(
+            REFERENCE_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_versioned_url_is_immutable(self):
+        version = json.loads(self.anonymous.get(REFERENCE_URL).content)[
+            'version']
+        response = self.anonymous.get(REFERENCE_URL, {'v': version})
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_rebuilt_after_change(self):
+        etag = self.anonymous.get(REFERENCE_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Перец', measurement_unit='г')
+        response = self.anonymous.get(REFERENCE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Перец', response.content.decode())
+
+    def test_post_not_allowed(self):
+        self.assertEqual(self.anonymous.post(REFERENCE_URL).status_code, 405)
@@ -0,0 +1,70 @@
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from api.api_views import parsers, renderers
+from api.api_views.parsers import FastJSONParser
+from api.api_views.renderers import FastJSONRenderer
+
+from .base import APITestCase
+
+DATA = {
+    'id': 1,
+    'name': 'Блины',
+    'amount': Decimal('1.50'),
+    'label': gettext_lazy('Рецепт'),
+    'pub_date': datetime.datetime(2023, 1, 2, 3, 4, 5,
+                                  tzinfo=datetime.timezone.utc),
+    'tags': [{'slug': 'breakfast'}],
+    'image': None,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """ Ответ FastJSONRenderer совпадает с JSONRenderer DRF. """
+
+    def test_same_as_drf(self):
+        self.assertEqual(FastJSONRenderer().render(DATA),
+                         JSONRenderer().render(DATA))
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(DATA),
+                             JSONRenderer().render(DATA))
+
+    def test_indent(self):
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, 'application/json; indent=2'),
+            JSONRenderer().render(DATA, 'application/json; indent=2'))
+
+    def test_parse(self):
+        data = FastJSONParser().parse(
+            io.BytesIO('{"name": "Блины", "amount": 1.5}'.encode()))
+        self.assertEqual(data, {'name': 'Блины', 'amount': 1.5})
+        with mock.patch.object(parsers, 'orjson', None):
+            self.assertEqual(FastJSONParser().parse(
+                io.BytesIO(b'{"id": 1}')), {'id': 1})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"id":'))
+
+
+class FastJSONEndpointTests(APITestCase):
+
+    def test_invalid_body(self):
+        response = self.client.post(
+            '/api/recipes/', '{"name":', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_browsable_api(self):
+        response = self.anonymous.get(
+            '/api/recipes/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response['Content-Type'])
@@ -0,0 +1,149 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from backend.db_router import (ReplicaRouter, ReplicaRoutingMiddleware,
+                               routing_state)
+from recipes.models import Recipe
+
+REPLICAS = ['replica_1']
+AUTHORIZATION = {'HTTP_AUTHORIZATION': 'Token 1234'}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRoutingTests(SimpleTestCase):
+    """ Решения маршрутизатора в рамках запроса. Настоящие запросы
+    к реплике не выполняются: в тестах у нее нет отдельной базы. """
+    databases = {'default'}
+    router = ReplicaRouter()
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False, model=Recipe):
+        """ Проводит запрос через middleware и возвращает базу,
+        выбранную для чтения model. """
+        reads = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(model)
+            reads.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return reads[0]
+
+    async def aroute(self, request, write=False, model=Recipe):
+        reads = []
+
+        async def view(request):
+            if write:
+                self.router.db_for_write(model)
+            reads.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        await ReplicaRoutingMiddleware(view)(request)
+        return reads[0]
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.route(self.factory.get('/')), 'replica_1')
+        self.assertIsNone(routing_state.get())
+
+    def test_unsafe_request_reads_primary(self):
+        self.assertEqual(self.route(self.factory.post('/')), 'default')
+
+    def test_token_always_read_from_primary(self):
+        self.assertEqual(
+            self.route(self.factory.get('/'), model=Token), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.route(self.factory.get('/')), 'default')
+
+    def test_read_after_write_in_request(self):
+        self.assertEqual(
+            self.route(self.factory.get('/'), write=True), 'default')
+
+    def test_read_in_transaction(self):
+        reads = []
+
+        def view(request):
+            with transaction.atomic():
+                reads.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(reads, ['default'])
+
+    def test_sticky_after_write(self):
+        self.route(self.factory.post('/', **AUTHORIZATION), write=True)
+        self.assertEqual(
+            self.route(self.factory.get('/', **AUTHORIZATION)), 'default')
+        # Другой клиент по-прежнему читает с реплики.
+        self.assertEqual(self.route(self.factory.get('/')), 'replica_1')
+
+    def test_failed_write_not_sticky(self):
+        self.route(self.factory.post('/', **AUTHORIZATION))
+        self.assertEqual(
+            self.route(self.factory.get('/', **AUTHORIZATION)), 'replica_1')
+
+    @override_settings(DATABASE_STICKY_SECONDS=0)
+    def test_sticky_expires(self):
+        self.route(self.factory.post('/', **AUTHORIZATION), write=True)
+        self.assertEqual(
+            self.route(self.factory.get('/', **AUTHORIZATION)), 'replica_1')
+
+    async def test_async_request(self):
+        self.assertEqual(
+            await self.aroute(self.factory.get('/')), 'replica_1')
+        await self.aroute(
+            self.factory.post('/', **AUTHORIZATION), write=True)
+        self.assertEqual(
+            await self.aroute(self.factory.get('/', **AUTHORIZATION)),
+            'default')
+        self.assertIsNone(routing_state.get())
+
+    async def test_write_in_sync_view_under_asgi(self):
+        def view(request):
+            self.router.db_for_write(Recipe)
+            return HttpResponse()
+
+        # sync_to_async копирует контекст, но состояние запроса общее.
+        await ReplicaRoutingMiddleware(sync_to_async(view))(
+            self.factory.post('/', **AUTHORIZATION))
+        self.assertEqual(
+            await self.aroute(self.factory.get('/', **AUTHORIZATION)),
+            'default')
+
+    def streaming_view(self, request):
+        def content():
+            yield self.router.db_for_read(Recipe)
+
+        return StreamingHttpResponse(content())
+
+    def test_streaming_response_reads_replica(self):
+        response = ReplicaRoutingMiddleware(self.streaming_view)(
+            self.factory.get('/'))
+        # Тело отдается после выхода из middleware.
+        self.assertEqual(b''.join(response), b'replica_1')
+        self.assertIsNotNone(routing_state.get())
+        response.close()
+        self.assertIsNone(routing_state.get())
+
+    async def test_async_streaming_response_reads_replica(self):
+        async def view(request):
+            return self.streaming_view(request)
+
+        response = await ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(b''.join(response), b'replica_1')
+        self.assertIsNotNone(routing_state.get())
+        await sync_to_async(response.close)()
+        self.assertIsNone(routing_state.get())
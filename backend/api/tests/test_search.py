@@ -0,0 +1,49 @@
+from .base import APITestCase, create_recipe
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pie = create_recipe(cls.other, 'Пирог с творогом', [cls.dinner],
+                                [(cls.ingredients[3], 300)])
+        cls.pie.text = 'Творог протереть, добавить яйца.'
+        cls.pie.save()
+
+    def search(self, query, **params):
+        response = self.anonymous.get(
+            RECIPES_URL, {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search('сырник'), ['Сырники'])
+
+    def test_name_ranked_above_text(self):
+        self.syrniki.text = 'Из творога.'
+        self.syrniki.save()
+        self.assertEqual(
+            self.search('творог'), ['Пирог с творогом', 'Сырники'])
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search('пирог яйца'), ['Пирог с творогом'])
+        self.assertEqual(self.search('пирог блины'), [])
+
+    def test_combined_with_filters(self):
+        self.assertEqual(self.search('пирог', tags='breakfast'), [])
+        self.assertEqual(
+            self.search('пирог', tags='dinner'), ['Пирог с творогом'])
+
+    def test_blank_query_ignored(self):
+        self.assertEqual(
+            len(self.search(' ', limit=10)), len(self.recipes) + 1)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.search('борщ'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.name = 'Борщ'
+            self.soup.save()
+        self.assertEqual(self.search('борщ'), ['Борщ'])
@@ -0,0 +1,185 @@
+import json
+
+from rest_framework.test import APIClient
+
+from recipes import shopping_list
+from recipes.models import (Favorite, Recipe, ShoppingCart,
+                            ShoppingCartIngredient)
+
+from .base import PNG_IMAGE, APITestCase
+
+RECIPES_URL = '/api/recipes/'
+DOWNLOAD_URL = f'{RECIPES_URL}download_shopping_cart/'
+VIEWER_SHOPPING_LIST = [
+    {'name': 'Молоко', 'measurement_unit': 'г', 'amount': 300},
+    {'name': 'Мука', 'measurement_unit': 'г', 'amount': 250},
+    {'name': 'Сахар', 'measurement_unit': 'г', 'amount': 50},
+    {'name': 'Сметана', 'measurement_unit': 'г', 'amount': 100},
+]
+
+
+class ShoppingCartTests(APITestCase):
+
+    def get_totals(self):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=self.viewer).values_list('ingredient__name', 'total_amount'))
+
+    def assertAggregateConsistent(self):
+        self.assertEqual(shopping_list.get_stored_totals(),
+                         shopping_list.get_expected_totals())
+
+    def test_add_and_remove(self):
+        url = f'{RECIPES_URL}{self.soup.pk}/shopping_cart/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['name'], 'Суп')
+        self.assertEqual(self.get_totals()['Соль'], 5)
+        self.assertEqual(self.get_totals()['Сметана'], 150)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.in_carts_count, 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertNotIn('Соль', self.get_totals())
+        self.assertEqual(self.get_totals()['Сметана'], 100)
+        self.assertAggregateConsistent()
+
+    def test_recipe_update(self):
+        flour, milk = self.ingredients[3], self.ingredients[4]
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.patch(
+            f'{RECIPES_URL}{self.pancakes.pk}/', {
+                'name': 'Блины', 'text': 'Описание', 'cooking_time': 20,
+                'image': PNG_IMAGE, 'tags': [self.breakfast.pk],
+                'ingredients': [{'id': flour.pk, 'amount': 100},
+                                {'id': milk.pk, 'amount': 400}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.get_totals(),
+            {'Молоко': 400, 'Мука': 150, 'Сахар': 30, 'Сметана': 100})
+        self.assertAggregateConsistent()
+
+    def test_recipe_delete(self):
+        author = APIClient()
+        author.force_authenticate(self.author)
+        response = author.delete(f'{RECIPES_URL}{self.syrniki.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_totals(),
+                         {'Молоко': 300, 'Мука': 200, 'Сахар': 20})
+        self.assertAggregateConsistent()
+
+    def test_batch_add(self):
+        missing = Recipe.objects.latest('id').pk + 1
+        ids = [self.soup.pk, self.pancakes.pk, missing, self.soup.pk]
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                f'{RECIPES_URL}shopping_cart/', {'recipes': ids},
+                format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.soup.pk, 'status': 'added'},
+            {'id': self.pancakes.pk, 'status': 'unchanged'},
+            {'id': missing, 'status': 'not_found'},
+        ])
+        self.assertEqual(self.get_totals()['Соль'], 5)
+        self.soup.refresh_from_db()
+        self.assertEqual(self.soup.in_carts_count, 1)
+        self.assertAggregateConsistent()
+
+    def test_batch_remove(self):
+        ids = [self.pancakes.pk, self.syrniki.pk, self.soup.pk]
+        response = self.client.delete(
+            f'{RECIPES_URL}shopping_cart/', {'recipes': ids}, format='json')
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['removed', 'removed', 'unchanged'])
+        self.assertFalse(
+            ShoppingCart.objects.filter(user=self.viewer).exists())
+        self.assertEqual(self.get_totals(), {})
+        self.assertAggregateConsistent()
+
+    def test_batch_favorites(self):
+        ids = [recipe.pk for recipe in self.recipes]
+        response = self.client.post(
+            f'{RECIPES_URL}favorite/', {'recipes': ids}, format='json')
+        self.assertEqual(
+            [item['status'] for item in response.data['results']].count(
+                'added'), len(ids) - 1)
+        self.assertEqual(
+            Favorite.objects.filter(user=self.viewer).count(), len(ids))
+        response = self.client.delete(
+            f'{RECIPES_URL}favorite/', {'recipes': ids[:2]}, format='json')
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['removed', 'removed'])
+        self.pancakes.refresh_from_db()
+        self.assertEqual(self.pancakes.favorites_count, 0)
+
+    def test_batch_validation(self):
+        too_many = list(range(1, 102))
+        for payload in ({}, {'recipes': []}, {'recipes': ['x']},
+                        {'recipes': too_many}):
+            with self.subTest(payload=payload):
+                response = self.client.post(
+                    f'{RECIPES_URL}favorite/', payload, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_batch_requires_authentication(self):
+        response = self.anonymous.post(
+            f'{RECIPES_URL}shopping_cart/', {'recipes': [self.soup.pk]},
+            format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class DownloadShoppingCartTests(APITestCase):
+
+    def download(self, **params):
+        with self.assertNumQueries(2):
+            response = self.client.get(DOWNLOAD_URL, params)
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, 200)
+        return response, content
+
+    def test_json(self):
+        response, content = self.download(format='json')
+        self.assertEqual(
+            response['Content-Type'], 'application/json; charset=utf-8')
+        self.assertEqual(json.loads(content), VIEWER_SHOPPING_LIST)
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertIn('shopping_cart.csv', response['Content-Disposition'])
+        self.assertEqual(content.splitlines(), [
+            'Ингредиент,Количество,Единица',
+            'Молоко,300,г', 'Мука,250,г', 'Сахар,50,г', 'Сметана,100,г'])
+
+    def test_text(self):
+        _, content = self.download(format='txt')
+        self.assertIn('2. Мука — 250 г', content)
+
+    def test_accept_header(self):
+        response = self.client.get(DOWNLOAD_URL, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+    def test_pdf_cached(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        with self.assertNumQueries(1):
+            cached = self.client.get(DOWNLOAD_URL)
+        self.assertEqual(cached.content, response.content)
+
+    def test_cart_change_renders_again(self):
+        self.client.get(DOWNLOAD_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.create(user=self.viewer, recipe=self.soup)
+        with self.assertNumQueries(2):
+            response = self.client.get(DOWNLOAD_URL)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+    def test_requires_authentication(self):
+        response = self.anonymous.get(DOWNLOAD_URL, {'format': 'csv'})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,25 @@
+from recipes.models import Tag
+
+from .base import APITestCase
+
+TAGS_URL = '/api/tags/'
+
+
+class TagTests(APITestCase):
+
+    def test_list_and_not_modified(self):
+        with self.assertNumQueries(1):
+            response = self.anonymous.get(TAGS_URL)
+        self.assertEqual(len(response.data), 2)
+        with self.assertNumQueries(0):
+            response = self.anonymous.get(
+                TAGS_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_resets_etag(self):
+        etag = self.anonymous.get(TAGS_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', color='#FFFFFF', slug='lunch')
+        response = self.anonymous.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
@@ -0,0 +1,86 @@
+from django.test import override_settings
+
+from users.models import AuthorSubscription
+
+from .base import APITestCase
+
+USERS_URL = '/api/users/'
+SUBSCRIPTIONS_URL = f'{USERS_URL}subscriptions/'
+RECIPES_URL = '/api/recipes/'
+
+
+class SubscriptionTests(APITestCase):
+
+    def test_subscriptions(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(SUBSCRIPTIONS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        author = response.data['results'][0]
+        self.assertEqual(author['username'], 'author')
+        self.assertTrue(author['is_subscribed'])
+        self.assertEqual(author['recipes_count'], 3)
+        self.assertEqual(
+            [recipe['name'] for recipe in author['recipes']],
+            ['Суп', 'Сырники'])
+
+    def test_recipes_limit(self):
+        AuthorSubscription.objects.create(
+            subscriber=self.viewer, author=self.other)
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                SUBSCRIPTIONS_URL, {'recipes_limit': 1})
+        self.assertEqual(
+            {author['username']: len(author['recipes'])
+             for author in response.data['results']},
+            {'author': 1, 'other': 1})
+
+    @override_settings(SUBSCRIPTION_RECIPES_LIMIT=3)
+    def test_invalid_limit_uses_default(self):
+        for value in ('', 'many', '-1'):
+            with self.subTest(recipes_limit=value):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL, {'recipes_limit': value})
+                self.assertEqual(
+                    len(response.data['results'][0]['recipes']), 3)
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                SUBSCRIPTIONS_URL, {'fields': 'id,username'})
+        self.assertEqual(
+            response.data['results'],
+            [{'id': self.author.pk, 'username': 'author'}])
+
+    def test_subscribe_and_unsubscribe(self):
+        url = f'{USERS_URL}{self.other.pk}/subscribe/'
+        response = self.client.post(f'{url}?recipes_limit=1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['recipes_count'], 2)
+        self.assertEqual(len(response.data['recipes']), 1)
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [author['username'] for author in response.data['results']],
+            ['author'])
+
+    def test_users_list_fields(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.anonymous.get(USERS_URL, {'fields': 'username'})
+        self.assertEqual(
+            {user['username'] for user in response.data['results']},
+            {'viewer', 'author', 'other'})
+        self.assertNotIn('"email"', queries.captured_queries[-1]['sql'])
+
+
+class UserTests(APITestCase):
+
+    def test_password_not_exposed(self):
+        response = self.anonymous.get(USERS_URL)
+        self.assertNotIn('password', response.data['results'][0])
+        response = self.anonymous.get(RECIPES_URL)
+        self.assertNotIn('password', response.data['results'][0]['author'])
+        response = self.anonymous.get(USERS_URL, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
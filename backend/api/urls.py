@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework import routers
 
 from api.api_views import users_views, recipes_views
+from api.api_views.reference import reference_view
 
 router = routers.DefaultRouter()
 router.register('tags', recipes_views.TagViewSet, basename='tags')
@@ -11,6 +12,7 @@ router.register('ingredients', recipes_views.IngredientViewSet,
                 basename='ingredients')
 
 urlpatterns = [
+    path('reference/', reference_view, name='reference'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
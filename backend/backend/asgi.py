@@ -1,7 +1,26 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+ASYNC_URLCONF = 'backend.asgi_urls'
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    """ Запросы, пришедшие через ASGI, разбираются по backend.asgi_urls:
+    там поверх обычных маршрутов подключены асинхронные обработчики
+    чтения. ROOT_URLCONF для WSGI, команд и reverse() вне запроса
+    остается прежним. """
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASYNC_URLCONF
+        return request, error_response
+
+
+# То же, что get_asgi_application(), но со своим обработчиком.
+django.setup(set_prefix=False)
+application = AsyncViewsASGIHandler()
@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+from backend.urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.async_urls')),
+    *wsgi_urlpatterns,
+]
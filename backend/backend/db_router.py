@@ -0,0 +1,147 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_KEY_PREFIX = 'db_sticky'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Модели, которые всегда читаются с основной базы: токен, выданный
+# при входе, должен находиться уже в следующем запросе.
+PRIMARY_MODELS = frozenset(('authtoken.token', 'sessions.session'))
+
+
+class RoutingState:
+    """ Состояние маршрутизации текущего запроса. """
+
+    def __init__(self, primary):
+        self.primary = primary
+        self.written = False
+
+
+routing_state = ContextVar('db_routing_state', default=None)
+
+
+def get_sticky_key(request):
+    """ Ключ кеша клиента для чтения своих записей: по заголовку
+    Authorization или сессии. Анонимные запросы без сессии ключа
+    не имеют. """
+    credentials = (request.headers.get('Authorization')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return '{}:{}'.format(
+        STICKY_KEY_PREFIX, hashlib.sha256(credentials.encode()).hexdigest())
+
+
+class ReplicaRouter:
+    """ Читает с реплик, пишет в основную базу.
+    Вне запросов (команды, сигналы после ответа) и после записи
+    в текущем запросе чтение идет с основной базы. """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if (state is None or state.primary or not settings.DATABASE_REPLICAS
+                or model._meta.label_lower in PRIMARY_MODELS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.primary = state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """ Разрешает чтение с реплик для безопасных запросов.
+    После записи клиент читает с основной базы DATABASE_STICKY_SECONDS
+    секунд, чтобы видеть свои изменения несмотря на отставание
+    реплик. Работает и в синхронном, и в асинхронном стеке. """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        sticky_key = get_sticky_key(request)
+        state = RoutingState(
+            primary=request.method not in SAFE_METHODS or (
+                sticky_key is not None and cache.get(sticky_key) is not None))
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            routing_state.reset(token)
+            raise
+        if response.streaming:
+            self.finish_on_close(response, state, sticky_key, token)
+        else:
+            self.finish(state, sticky_key, token)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        sticky_key = get_sticky_key(request)
+        state = RoutingState(
+            primary=request.method not in SAFE_METHODS or (
+                sticky_key is not None
+                and await cache.aget(sticky_key) is not None))
+        # Синхронные представления выполняются в потоке через
+        # sync_to_async, который копирует контекст: состояние
+        # и отметка о записи остаются общими.
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            routing_state.reset(token)
+            raise
+        if response.streaming:
+            self.finish_on_close(response, state, sticky_key, token)
+            return response
+        routing_state.reset(token)
+        if state.written and sticky_key is not None:
+            await cache.aset(
+                sticky_key, True, settings.DATABASE_STICKY_SECONDS)
+        return response
+
+    @staticmethod
+    def finish(state, sticky_key, token):
+        try:
+            routing_state.reset(token)
+        except ValueError:
+            # ASGI-обработчик закрывает ответ через sync_to_async
+            # в копии контекста, изменения которой asgiref возвращает
+            # в задачу запроса.
+            routing_state.set(None)
+        if state.written and sticky_key is not None:
+            cache.set(sticky_key, True, settings.DATABASE_STICKY_SECONDS)
+
+    def finish_on_close(self, response, state, sticky_key, token):
+        """ Тело потокового ответа читает базу уже после выхода
+        из middleware, поэтому состояние сбрасывается при
+        response.close(). """
+        response._resource_closers.append(
+            lambda: self.finish(state, sticky_key, token))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from backend.settings import *  # noqa: F401, F403
+from backend.settings import DATABASES
+
+SECRET_KEY = os.getenv('SECRET_KEY') or 'benchmark'
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+CSRF_TRUSTED_ORIGINS = []
+
+BENCHMARK_DIR = tempfile.mkdtemp(prefix='foodgram-benchmark-')
+
+if os.getenv('BENCHMARK_DATABASE') == 'postgresql':
+    # Тестовая база test_<POSTGRES_DB> создается и удаляется командой.
+    DATABASES = {'default': DATABASES['default']}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BENCHMARK_DIR, 'db.sqlite3'),
+        }
+    }
+
+DATABASE_REPLICAS = []
+
+MEDIA_ROOT = os.path.join(BENCHMARK_DIR, 'media')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+REQUEST_METRICS_ENABLED = False
+
+# Рассылка по лентам выполняется сразу, чтобы замеры были повторяемы.
+FEED_FANOUT_WORKERS = 0
+
+# Замер идет в одном процессе, общий кеш не нужен.
+SILENCED_SYSTEM_CHECKS = ['recipes.W001']
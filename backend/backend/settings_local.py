@@ -0,0 +1,32 @@
+import os
+
+from backend.settings import *  # noqa: F401, F403
+from backend.settings import BASE_DIR
+
+SECRET_KEY = os.getenv('SECRET_KEY') or 'local'
+
+DEBUG = True
+
+ALLOWED_HOSTS = ['*']
+
+CSRF_TRUSTED_ORIGINS = []
+
+# Две SQLite-базы для проверки маршрутизации без Postgres: реплика
+# открывает тот же файл, поэтому данные в ней видны сразу.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'replica_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = ['replica_1']
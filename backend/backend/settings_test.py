@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+from backend.settings import *  # noqa: F401, F403
+
+SECRET_KEY = os.getenv('SECRET_KEY') or 'test'
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+CSRF_TRUSTED_ORIGINS = []
+
+# Миграции приложений создаются при развертывании и в репозитории
+# не хранятся, поэтому тестовая база строится прямо по моделям.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIGRATE': False},
+    }
+}
+
+DATABASE_REPLICAS = []
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-test-media-')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Рассылка по лентам выполняется сразу: SQLite не допускает
+# параллельной записи из фонового потока.
+FEED_FANOUT_WORKERS = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'null': {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['null'],
+            'propagate': False,
+        },
+        'django.request': {
+            'handlers': ['null'],
+            'propagate': False,
+        },
+    },
+}
+
+# Тесты идут в одном процессе, общий кеш не нужен.
+SILENCED_SYSTEM_CHECKS = ['recipes.W001']
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Tag, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Favorite)
+                     ShoppingCart, ShoppingCartIngredient, Favorite)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -36,6 +36,12 @@ class ShoppingcartAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
 
 
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    """ Админка для модели ShoppingCartIngredient. """
+    list_display = ('user', 'ingredient', 'total_amount')
+
+
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     """ Админка для модели FavoriteRecipe. """
@@ -46,12 +52,13 @@ class FavoriteAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     """ Админка для модели Recipe. """
     list_display = ('name', 'author',
-                    'get_favorite_count')
+                    'get_favorite_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags')
     inlines = (RecipeIngredientInline,)
 
     def get_favorite_count(self, obj):
         """ Получает общее количество избранных рецептов. """
-        return obj.favoriting.count()
+        return obj.favorites_count
 
     get_favorite_count.short_description = 'Избранное'
+    get_favorite_count.admin_order_field = 'favorites_count'
@@ -0,0 +1,63 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'version'
+INGREDIENTS_VERSION = 'ingredients'
+TAGS_VERSION = 'tags'
+RECIPES_VERSION = 'recipes'
+RECIPE_VERSION = 'recipe'
+RECIPE_COUNTERS_VERSION = 'recipe_counters'
+USERS_VERSION = 'users'
+USER_VERSION = 'user'
+VIEWER_VERSION = 'viewer'
+SHOPPING_CART_VERSION = 'shopping_cart'
+
+
+def get_version_key(*parts):
+    """ Ключ кеша для метки версии. """
+    return ':'.join((VERSION_KEY_PREFIX, *map(str, parts)))
+
+
+def new_version():
+    """ Метка версии: время изменения и случайный суффикс. """
+    return f'{time.time():.6f}:{uuid4().hex}'
+
+
+def get_version_timestamp(version):
+    """ Время изменения, записанное в метке версии. """
+    return float(version.split(':', 1)[0])
+
+
+def get_version(*parts):
+    """ Возвращает текущую метку версии.
+    Если метка отсутствует в кеше, создает новую. """
+    key = get_version_key(*parts)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(*keys):
+    """ Метки версий для нескольких ключей за одно обращение к кешу.
+    Каждый ключ задается кортежем частей, как в get_version. """
+    cache_keys = [get_version_key(*parts) for parts in keys]
+    versions = cache.get_many(cache_keys)
+    return [
+        versions.get(cache_key) or get_version(*parts)
+        for cache_key, parts in zip(cache_keys, keys)
+    ]
+
+
+def bump_version(*parts):
+    """ Меняет метку версии, делая устаревшими зависящие от нее данные.
+    Внутри транзакции метка меняется после ее фиксации: иначе
+    параллельный запрос успел бы собрать кеш по новой метке
+    из еще не зафиксированных данных. При откате метка не меняется. """
+    key = get_version_key(*parts)
+    transaction.on_commit(lambda: cache.set(key, new_version(), None))
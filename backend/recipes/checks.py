@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """ Метки версий хранятся в кеше: если он свой у каждого процесса,
+    изменения из другого воркера или команды manage.py не видны,
+    и кеши отдают устаревшие данные до перезапуска. """
+    if settings.DEBUG or not isinstance(
+            caches['default'], (LocMemCache, DummyCache)):
+        return []
+    return [Warning(
+        'Кеш по умолчанию не общий для процессов.',
+        hint='Задайте REDIS_URL, чтобы метки версий видели все воркеры '
+             'и команды manage.py.',
+        id='recipes.W001',
+    )]
@@ -0,0 +1,65 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.cache_versions import RECIPE_COUNTERS_VERSION, bump_version
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+FAVORITES_COUNT = 'favorites_count'
+IN_CARTS_COUNT = 'in_carts_count'
+COUNTER_SOURCES = (
+    (FAVORITES_COUNT, Favorite),
+    (IN_CARTS_COUNT, ShoppingCart),
+)
+
+
+def bump_counters(recipe_ids):
+    """ Обновляет метки счетчиков рецептов. Метка у каждого рецепта
+    своя: отметка одного рецепта не сбрасывает ETag остальных. """
+    for recipe_id in recipe_ids:
+        bump_version(RECIPE_COUNTERS_VERSION, recipe_id)
+
+
+def change_counter(field, recipe_ids, delta):
+    """ Атомарно меняет счетчик рецептов на delta выражением F().
+    Счетчик не уходит ниже нуля, расхождения исправляет reconcile. """
+    queryset = Recipe.objects.filter(pk__in=recipe_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+    bump_counters(recipe_ids)
+
+
+def get_actual_count(model):
+    """ Подзапрос с фактическим количеством строк model для рецепта. """
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def get_drift():
+    """ Рецепты с расходящимися счетчиками:
+    поле -> список (id, сохранено, фактически). """
+    drift = {}
+    for field, model in COUNTER_SOURCES:
+        drift[field] = list(Recipe.objects.annotate(
+            actual=get_actual_count(model)
+        ).exclude(**{field: F('actual')}).values_list(
+            'id', field, 'actual').order_by('id'))
+    return drift
+
+
+def reconcile():
+    """ Пересчитывает расходящиеся счетчики по таблицам
+    избранного и корзин. Возвращает число исправленных рецептов. """
+    fixed = set()
+    for field, model in COUNTER_SOURCES:
+        recipe_ids = list(Recipe.objects.annotate(
+            actual=get_actual_count(model)
+        ).exclude(**{field: F('actual')}).values_list('id', flat=True))
+        if recipe_ids:
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                **{field: get_actual_count(model)})
+            fixed.update(recipe_ids)
+    bump_counters(fixed)
+    return len(fixed)
@@ -0,0 +1,224 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import AuthorSubscription
+
+FANOUT_ON_READ_AUTHORS_KEY = 'feed:fanout_on_read_authors'
+FANOUT_ON_READ_REFRESH_KEY = 'feed:fanout_on_read_refresh'
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """ Поток для рассылки рецептов по лентам вне запроса. """
+    return ThreadPoolExecutor(
+        max_workers=settings.FEED_FANOUT_WORKERS,
+        thread_name_prefix='feed'
+    )
+
+
+def run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('feed task %s failed', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(func, *args):
+    """ Выполняет func после фиксации транзакции в фоновом потоке,
+    чтобы запись в ленты не задерживала ответ. При
+    FEED_FANOUT_WORKERS = 0 func выполняется сразу после фиксации. """
+    def submit():
+        if settings.FEED_FANOUT_WORKERS:
+            get_executor().submit(run_task, func, *args)
+        else:
+            func(*args)
+
+    transaction.on_commit(submit)
+
+
+def refresh_fanout_on_read_authors():
+    """ Пересчитывает авторов, чьи рецепты не рассылаются по лентам
+    подписчиков, а подмешиваются при чтении. Рецепты авторов,
+    которые опустились ниже порога, переносятся в ленты подписчиков:
+    иначе опубликованные за это время рецепты из ленты пропадут.
+    Пересчет проходит по всем подпискам, поэтому выполняется
+    командой timelines по расписанию или в фоне, но не в запросе. """
+    author_ids = frozenset(
+        AuthorSubscription.objects.values('author').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('author', flat=True)
+    )
+    # Множество хранится без срока жизни, чтобы при пересчете
+    # было с чем сравнить.
+    previous = cache.get(FANOUT_ON_READ_AUTHORS_KEY)
+    cache.set(FANOUT_ON_READ_AUTHORS_KEY, author_ids, None)
+    cache.delete(FANOUT_ON_READ_REFRESH_KEY)
+    if previous is not None:
+        for author_id in previous - author_ids:
+            run_after_commit(backfill_author, author_id)
+    return author_ids
+
+
+def get_fanout_on_read_authors():
+    """ Авторы с чтением по запросу из кеша. Если кеш их потерял,
+    пересчет запускается в фоне, а до него рецепты рассылаются
+    по лентам всех подписчиков. """
+    author_ids = cache.get(FANOUT_ON_READ_AUTHORS_KEY)
+    if author_ids is None:
+        if cache.add(FANOUT_ON_READ_REFRESH_KEY, True,
+                     settings.FEED_FANOUT_REFRESH_TIMEOUT):
+            run_after_commit(refresh_fanout_on_read_authors)
+        return frozenset()
+    return author_ids
+
+
+def check_author(author_id):
+    """ Сверяет положение автора относительно порога с числом его
+    подписчиков в базе и при расхождении пересчитывает множество
+    авторов с чтением по запросу. Возвращает это множество. """
+    author_ids = get_fanout_on_read_authors()
+    followers = AuthorSubscription.objects.filter(author_id=author_id).count()
+    if ((followers > settings.FEED_FANOUT_MAX_FOLLOWERS)
+            != (author_id in author_ids)):
+        author_ids = refresh_fanout_on_read_authors()
+    return author_ids
+
+
+def fan_out_recipe(recipe):
+    """ Добавляет новый рецепт в ленты подписчиков автора.
+    Рассылка выполняется в фоне после фиксации транзакции. """
+    run_after_commit(deliver_recipe, recipe.pk, recipe.author_id)
+
+
+def deliver_recipe(recipe_id, author_id):
+    if author_id in get_fanout_on_read_authors():
+        return
+    pub_date = Recipe.objects.filter(pk=recipe_id).values_list(
+        'pub_date', flat=True).first()
+    if pub_date is None:
+        return
+    followers = AuthorSubscription.objects.filter(
+        author_id=author_id).values_list('subscriber_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follower_id, recipe_id=recipe_id,
+                       pub_date=pub_date)
+         for follower_id in followers.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    trim_timelines(followers)
+
+
+def backfill_author(author_id):
+    """ Переносит последние рецепты автора в ленты его подписчиков
+    после того, как его рецепты перестали подмешиваться при чтении. """
+    recipes = list(Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date')[:settings.FEED_TIMELINE_LENGTH])
+    if not recipes:
+        return
+    followers = AuthorSubscription.objects.filter(
+        author_id=author_id).values_list('subscriber_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follower_id, recipe_id=recipe_id,
+                       pub_date=pub_date)
+         for follower_id in followers.iterator()
+         for recipe_id, pub_date in recipes),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    trim_timelines(followers)
+
+
+def fill_timeline(user_id, author_ids):
+    """ Добавляет в ленту пользователя последние рецепты авторов. """
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date')[:settings.FEED_TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       pub_date=pub_date)
+         for recipe_id, pub_date in recipes),
+        ignore_conflicts=True
+    )
+
+
+def subscribe(subscriber_id, author_id):
+    """ Заполняет ленту рецептами нового автора из подписок. """
+    if author_id not in check_author(author_id):
+        fill_timeline(subscriber_id, [author_id])
+        trim_timelines([subscriber_id])
+
+
+def unsubscribe(subscriber_id, author_id):
+    """ Убирает из ленты рецепты автора после отписки. """
+    TimelineEntry.objects.filter(
+        user_id=subscriber_id, recipe__author_id=author_id).delete()
+    check_author(author_id)
+
+
+def trim_timelines(user_ids):
+    """ Оставляет в лентах пользователей не больше FEED_TIMELINE_LENGTH
+    последних записей. Ленты обрезаются одним запросом, нумеруются
+    только записи переполненных лент. """
+    overflowing = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).values('user_id').annotate(
+        entries=Count('id')
+    ).filter(
+        entries__gt=settings.FEED_TIMELINE_LENGTH
+    ).values('user_id')
+    excess = TimelineEntry.objects.filter(
+        user_id__in=overflowing
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+        )
+    ).filter(position__gt=settings.FEED_TIMELINE_LENGTH).values('id')
+    TimelineEntry.objects.filter(id__in=excess).delete()
+
+
+def get_feed_filter(user):
+    """ Условие выборки рецептов ленты: записи ленты пользователя
+    и рецепты популярных авторов из его подписок. """
+    condition = Q(pk__in=TimelineEntry.objects.filter(
+        user=user).values('recipe_id'))
+    fanout_on_read = get_fanout_on_read_authors()
+    if fanout_on_read:
+        followed = set(AuthorSubscription.objects.filter(
+            subscriber=user, author_id__in=fanout_on_read
+        ).values_list('author_id', flat=True))
+        if followed:
+            condition |= Q(author_id__in=followed)
+    return condition
+
+
+def rebuild_timeline(user_id):
+    """ Заполняет ленту пользователя заново по его подпискам. """
+    fanout_on_read = get_fanout_on_read_authors()
+    author_ids = [
+        author_id for author_id in AuthorSubscription.objects.filter(
+            subscriber_id=user_id).values_list('author_id', flat=True)
+        if author_id not in fanout_on_read
+    ]
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    if author_ids:
+        fill_timeline(user_id, author_ids)
@@ -0,0 +1,82 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from threading import Event
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+WEBP_QUALITY = 80
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """ Пул потоков для декодирования и пережатия изображений.
+    Размер пула ограничивает число изображений в памяти одновременно. """
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_PROCESSING_WORKERS,
+        thread_name_prefix='recipe-images'
+    )
+
+
+class ImageProcessingTimeout(TimeoutError):
+    """ Изображение обрабатывается дольше IMAGE_PROCESSING_TIMEOUT. """
+
+
+def run_in_pool(func, *args):
+    """ Выполняет func в пуле и ждет результата.
+    Ожидание свободного потока в IMAGE_PROCESSING_TIMEOUT не входит:
+    пул ограничивает число изображений в памяти, и очередь к нему
+    ошибкой не считается. Тайм-аут отсчитывается от начала обработки. """
+    started = Event()
+
+    def run():
+        started.set()
+        return func(*args)
+
+    future = get_executor().submit(run)
+    started.wait()
+    try:
+        return future.result(timeout=settings.IMAGE_PROCESSING_TIMEOUT)
+    except FutureTimeoutError:
+        raise ImageProcessingTimeout(
+            'Изображение не обработано за '
+            f'{settings.IMAGE_PROCESSING_TIMEOUT} с.')
+
+
+def make_variant(image_file, size):
+    """ Уменьшенная копия изображения в формате WebP. """
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if image.mode in ('LA', 'P') else 'RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def make_variants(image_file):
+    return {
+        name: make_variant(image_file, size)
+        for name, size in IMAGE_VARIANTS.items()
+    }
+
+
+def attach_variants(recipe):
+    """ Создает уменьшенные копии фото рецепта.
+    Файлы сохраняются в хранилище, сам рецепт не сохраняется. """
+    variants = run_in_pool(make_variants, recipe.image)
+    base_name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    for name, content in variants.items():
+        getattr(recipe, f'image_{name}').save(
+            f'{base_name}_{name}.webp', content, save=False)
@@ -0,0 +1,88 @@
+from bisect import bisect_left
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+
+from recipes.cache_versions import INGREDIENTS_VERSION, get_version
+
+
+class IngredientPrefixIndex:
+    """ Индекс ингредиентов в памяти процесса для поиска по началу
+    названия. Строится при первом обращении и перестраивается
+    после изменения метки версии ингредиентов. Версия и данные
+    хранятся одним кортежем и заменяются целиком, поэтому читатель
+    всегда видит согласованный индекс. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._state = (None, [], [])
+
+    @staticmethod
+    def _build(version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        return (
+            version,
+            [name.casefold() for _, name, _ in rows],
+            [{'id': pk, 'name': name, 'measurement_unit': unit}
+             for pk, name, unit in rows],
+        )
+
+    @staticmethod
+    def _get_rows():
+        from recipes.models import Ingredient
+
+        return Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit')
+
+    def _ensure_fresh(self):
+        version = get_version(INGREDIENTS_VERSION)
+        if self._state[0] != version:
+            with self._lock:
+                if self._state[0] != version:
+                    self._state = self._build(version, self._get_rows())
+        return self._state
+
+    async def _aensure_fresh(self):
+        """ Асинхронный вариант _ensure_fresh(). Блокировка потоков
+        не берется: пока другой поток читает базу под ней, цикл
+        событий стоял бы. Индекс строится без блокировки и заменяется
+        одним присваиванием. """
+        version = await sync_to_async(get_version)(INGREDIENTS_VERSION)
+        state = self._state
+        if state[0] != version:
+            rows = [row async for row in self._get_rows()]
+            state = self._state = self._build(version, rows)
+        return state
+
+    def all(self):
+        """ Все ингредиенты, отсортированные по названию. """
+        return self._ensure_fresh()[2]
+
+    def search(self, prefix, limit=None):
+        """ Ингредиенты, название которых начинается с prefix. """
+        return self._search(self._ensure_fresh(), prefix, limit)
+
+    async def aall(self):
+        """ Асинхронный вариант all(). """
+        return (await self._aensure_fresh())[2]
+
+    async def asearch(self, prefix, limit=None):
+        """ Асинхронный вариант search(). """
+        return self._search(await self._aensure_fresh(), prefix, limit)
+
+    @staticmethod
+    def _search(state, prefix, limit):
+        _, keys, items = state
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        result = []
+        for position in range(start, len(keys)):
+            if not keys[position].startswith(prefix):
+                break
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(items[position])
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
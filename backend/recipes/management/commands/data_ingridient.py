@@ -1,26 +1,100 @@
-from django.core.management.base import BaseCommand
 import csv
-from backend.settings import CSV_FILES_DIR
+import io
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from backend.settings import CSV_FILES_DIR
+from recipes.cache_versions import INGREDIENTS_VERSION, bump_version
 from recipes.models import Ingredient
 
+DEFAULT_BATCH_SIZE = 5000
+
 
 class Command(BaseCommand):
-    help = 'Импорт ингредиентовЫ'
+    help = 'Импорт ингредиентов'
 
-    def handle(self, *args, **options):
-        file_path = f'{CSV_FILES_DIR}/ingredients.csv'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Размер пакета для bulk_create.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только подсчитать новые ингредиенты, ничего не записывая.')
 
+    @staticmethod
+    def read_csv(file_path):
         with open(file_path, 'r', encoding='utf-8') as csv_file:
-            csv_reader = csv.reader(csv_file)
-            for row in csv_reader:
-                ingredient_name = row[0].strip()
-                ingredient_unit = row[1].strip()
-
-                ingredient, created = Ingredient.objects.get_or_create(
-                    name=ingredient_name,
-                    measurement_unit=ingredient_unit
-                )
-                self.stdout.write(self.style.SUCCESS(
-                    f'Ингредиент добавлен: {ingredient_name}'
-                ))
+            for row in csv.reader(csv_file):
+                if len(row) >= 2:
+                    yield row[0], row[1]
+
+    @staticmethod
+    def read_json(file_path):
+        with open(file_path, 'r', encoding='utf-8') as json_file:
+            for item in json.load(json_file):
+                yield item['name'], item['measurement_unit']
+
+    def read_ingredients(self):
+        """ Читает ингредиенты из всех файлов и убирает дубликаты. """
+        readers = (
+            (self.read_csv, f'{CSV_FILES_DIR}/ingredients.csv'),
+            (self.read_json, f'{CSV_FILES_DIR}/ingredients.json'),
+        )
+        total = 0
+        ingredients = {}
+        for reader, file_path in readers:
+            if not os.path.exists(file_path):
+                continue
+            for name, unit in reader(file_path):
+                total += 1
+                ingredient = (name.strip(), unit.strip())
+                if all(ingredient):
+                    ingredients.setdefault(ingredient, None)
+        return total, list(ingredients)
+
+    @staticmethod
+    def copy_ingredients(ingredients):
+        """ Загружает ингредиенты командой COPY (только PostgreSQL). """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(ingredients)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        total, ingredients = self.read_ingredients()
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit'))
+        new_ingredients = [
+            ingredient for ingredient in ingredients
+            if ingredient not in existing
+        ]
+
+        if new_ingredients and not options['dry_run']:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    self.copy_ingredients(new_ingredients)
+                else:
+                    Ingredient.objects.bulk_create(
+                        (Ingredient(name=name, measurement_unit=unit)
+                         for name, unit in new_ingredients),
+                        batch_size=options['batch_size']
+                    )
+            bump_version(INGREDIENTS_VERSION)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {total}, уникальных: {len(ingredients)}, '
+            f'уже в базе: {len(ingredients) - len(new_ingredients)}, '
+            f'{"будет добавлено" if options["dry_run"] else "добавлено"}: '
+            f'{len(new_ingredients)}.'
+        ))
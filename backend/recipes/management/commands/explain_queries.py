@@ -0,0 +1,105 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from recipes.models import Recipe, ShoppingCartIngredient
+from users.models import CustomUser
+
+PAGE_SIZE = 6
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SEQ_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)')
+SQLITE_NOT_TABLES = ('SUBQUERY', 'CONSTANT')
+
+
+def get_hot_queries(user):
+    """ Основные запросы API, которые должны обслуживаться индексами. """
+    return {
+        'Лента рецептов': Recipe.objects.with_user_flags(user)[:PAGE_SIZE],
+        'Рецепты автора': Recipe.objects.filter(author=user)[:PAGE_SIZE],
+        'Фильтр избранного': Recipe.objects.filter(
+            favoriting__user=user)[:PAGE_SIZE],
+        'Фильтр списка покупок': Recipe.objects.filter(
+            shopping_recipe__user=user)[:PAGE_SIZE],
+        'Список покупок': ShoppingCartIngredient.objects.filter(
+            user=user, total_amount__gt=0
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            ingredient_amount=F('total_amount')
+        ).order_by('ingredient__name'),
+        'Подписки': CustomUser.objects.filter(
+            author__subscriber=user
+        ).annotate(
+            recipes_count=Count('recipes')
+        ).order_by('username')[:PAGE_SIZE],
+    }
+
+
+def find_seq_scans(plan):
+    """ Таблицы, которые план читает последовательным сканированием. """
+    if connection.vendor == 'postgresql':
+        return POSTGRES_SEQ_SCAN.findall(plan)
+    tables = []
+    for line in plan.splitlines():
+        match = SQLITE_SEQ_SCAN.search(line)
+        if (match and 'USING' not in line
+                and match.group(1) not in SQLITE_NOT_TABLES):
+            tables.append(match.group(1))
+    return tables
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для основных запросов API и сообщает '
+            'о последовательных сканированиях таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя для персональных запросов.')
+        parser.add_argument(
+            '--ignore-table', action='append', default=[],
+            help='Таблица, сканирование которой допустимо.')
+        parser.add_argument(
+            '--force-index', action='store_true',
+            help='PostgreSQL: отключить enable_seqscan, чтобы остались '
+                 'только сканирования таблиц без подходящего индекса.')
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы запросов целиком.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id')
+        if options['user'] is not None:
+            users = users.filter(id=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователей для построения запросов.')
+
+        problems = []
+        with transaction.atomic():
+            if options['force_index'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for title, queryset in get_hot_queries(user).items():
+                plan = queryset.explain()
+                if options['verbose_plans']:
+                    self.stdout.write(f'{title}:\n{plan}\n')
+                scans = [
+                    table for table in find_seq_scans(plan)
+                    if table not in options['ignore_table']
+                ]
+                if scans:
+                    problems.append(title)
+                    self.stdout.write(self.style.WARNING(
+                        f'{title}: последовательное сканирование '
+                        f'{", ".join(sorted(set(scans)))}'))
+                else:
+                    self.stdout.write(f'{title}: OK')
+
+        if problems:
+            raise CommandError(
+                f'Запросов с последовательным сканированием: '
+                f'{len(problems)}.')
+        self.stdout.write(self.style.SUCCESS(
+            'Все основные запросы используют индексы.'))
@@ -0,0 +1,265 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes import counters, shopping_list
+from recipes.cache_versions import (RECIPES_VERSION, TAGS_VERSION,
+                                    USERS_VERSION, bump_version)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import get_search_vector
+from users.models import AuthorSubscription, CustomUser
+
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+DISHES = ('Салат', 'Суп', 'Рагу', 'Запеканка', 'Пирог', 'Паста', 'Омлет',
+          'Каша', 'Соус', 'Десерт')
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Федоров')
+SENTENCES = (
+    'Подготовьте и отмерьте все ингредиенты.',
+    'Нарежьте овощи небольшими кубиками.',
+    'Разогрейте сковороду с небольшим количеством масла.',
+    'Готовьте на среднем огне, периодически помешивая.',
+    'Посолите и поперчите по вкусу.',
+    'Дайте блюду настояться несколько минут.',
+    'Подавайте горячим.',
+)
+WEIGHT_UNITS = ('г', 'мл')
+PUBLICATION_PERIOD = timedelta(days=365)
+# Показатель степенного закона: чем больше, тем сильнее популярность
+# сосредоточена у первых элементов.
+POPULARITY_EXPONENT = 1.1
+
+
+def get_cum_weights(size):
+    """ Накопленные веса степенного распределения для random.choices. """
+    return list(accumulate(
+        1 / (rank + 1) ** POPULARITY_EXPONENT for rank in range(size)))
+
+
+def pick_distinct(rng, population, cum_weights, count):
+    """ До count разных элементов с учетом популярности. """
+    count = min(count, len(population))
+    picked = dict.fromkeys(
+        rng.choices(population, cum_weights=cum_weights, k=count * 2))
+    return list(islice(picked, count))
+
+
+def pick_count(rng, average, limit):
+    """ Количество с длинным хвостом (экспоненциальное распределение). """
+    if average <= 0:
+        return 0
+    return min(int(rng.expovariate(1 / average)), limit)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def explicit_pub_date():
+    """ Позволяет записать заданную дату публикации рецептов
+    вместо текущего времени из auto_now_add. """
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических пользователей, рецептов, подписок, '
+            'избранного и корзин для нагрузочного тестирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей.')
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Количество рецептов.')
+        parser.add_argument(
+            '--subscriptions', type=float, default=20,
+            help='Среднее число подписок на пользователя.')
+        parser.add_argument(
+            '--favorites', type=float, default=30,
+            help='Среднее число рецептов в избранном у пользователя.')
+        parser.add_argument(
+            '--carts', type=float, default=5,
+            help='Среднее число рецептов в корзине у пользователя.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пакета для bulk_create.')
+        parser.add_argument(
+            '--seed', type=int,
+            help='Начальное значение генератора для воспроизводимых данных.')
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс имен создаваемых пользователей.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        ingredients = list(
+            Ingredient.objects.values_list('id', 'measurement_unit'))
+        if not ingredients:
+            raise CommandError(
+                'Справочник ингредиентов пуст, '
+                'сначала выполните manage.py data_ingridient.')
+        if CustomUser.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                'укажите другой --prefix.')
+        # Популярность ингредиентов случайна, но воспроизводима при --seed.
+        self.rng.shuffle(ingredients)
+        self.ingredient_names = dict(Ingredient.objects.values_list(
+            'id', 'name'))
+
+        with transaction.atomic():
+            tag_ids = self.get_tag_ids()
+            user_ids = self.create_users(options['users'], prefix)
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, tag_ids, ingredients)
+            self.create_links(
+                AuthorSubscription, 'subscriber_id', 'author_id',
+                user_ids, user_ids, options['subscriptions'], shuffle=False)
+            self.create_links(
+                Favorite, 'user_id', 'recipe_id',
+                user_ids, recipe_ids, options['favorites'])
+            self.create_links(
+                ShoppingCart, 'user_id', 'recipe_id',
+                user_ids, recipe_ids, options['carts'])
+
+        self.stdout.write('Пересчет списков покупок и счетчиков...')
+        shopping_list.rebuild(self.batch_size)
+        counters.reconcile()
+        if connection.vendor == 'postgresql':
+            for batch in batched(recipe_ids, self.batch_size):
+                Recipe.objects.filter(pk__in=batch).update(
+                    search_vector=get_search_vector())
+        bump_version(USERS_VERSION)
+        bump_version(RECIPES_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}. '
+            'Ленты подписок пересобираются командой manage.py timelines.'))
+
+    def get_tag_ids(self):
+        """ Теги рецептов. Если тегов нет, создаются стандартные:
+        bulk_create сигналов не отправляет, поэтому метка версии
+        тегов меняется явно. Ингредиенты команда не создает. """
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS)
+            bump_version(TAGS_VERSION)
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count, prefix):
+        rng = self.rng
+        user_ids = []
+        users = (
+            CustomUser(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password='!',
+            )
+            for number in range(count)
+        )
+        for batch in batched(users, self.batch_size):
+            user_ids.extend(
+                user.pk for user in CustomUser.objects.bulk_create(batch))
+        self.stdout.write(f'Пользователи: {len(user_ids)}')
+        return user_ids
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredients):
+        """ Рецепты распределяются по авторам по степенному закону,
+        ингредиенты выбираются с учетом популярности. """
+        rng = self.rng
+        author_weights = get_cum_weights(len(user_ids))
+        ingredient_weights = get_cum_weights(len(ingredients))
+        now = timezone.now()
+        recipe_ids = []
+
+        for batch_numbers in batched(range(count), self.batch_size):
+            recipes, compositions = [], []
+            for _ in batch_numbers:
+                composition = pick_distinct(
+                    rng, ingredients, ingredient_weights, rng.randint(3, 12))
+                main_ingredient = self.ingredient_names[composition[0][0]]
+                recipes.append(Recipe(
+                    author_id=rng.choices(
+                        user_ids, cum_weights=author_weights)[0],
+                    name=f'{rng.choice(DISHES)} «{main_ingredient}»'[:200],
+                    text=' '.join(rng.sample(SENTENCES, 4)),
+                    cooking_time=max(1, min(
+                        int(rng.lognormvariate(3.4, 0.6)), 600)),
+                    image='recipes/synthetic.png',
+                    pub_date=now - PUBLICATION_PERIOD * rng.random(),
+                ))
+                compositions.append(composition)
+            with explicit_pub_date():
+                recipes = Recipe.objects.bulk_create(recipes)
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in rng.sample(
+                    tag_ids, rng.randint(1, min(3, len(tag_ids))))
+            )
+            RecipeIngredient.objects.bulk_create(
+                (
+                    RecipeIngredient(
+                        recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                        amount=(rng.randrange(10, 1000, 10)
+                                if unit in WEIGHT_UNITS
+                                else rng.randint(1, 10)))
+                    for recipe, composition in zip(recipes, compositions)
+                    for ingredient_id, unit in composition
+                ),
+                batch_size=self.batch_size
+            )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.stdout.write(f'Рецепты: {len(recipe_ids)} из {count}')
+        return recipe_ids
+
+    def create_links(self, model, owner_field, target_field,
+                     owner_ids, target_ids, average, shuffle=True):
+        """ Связи пользователей с популярными авторами или рецептами.
+        Без shuffle популярность убывает в порядке target_ids: так на
+        самых плодовитых авторов подписываются чаще. """
+        rng = self.rng
+        targets = list(target_ids)
+        if shuffle:
+            rng.shuffle(targets)
+        cum_weights = get_cum_weights(len(targets))
+        links = (
+            model(**{owner_field: owner_id, target_field: target_id})
+            for owner_id in owner_ids
+            for target_id in pick_distinct(
+                rng, targets, cum_weights,
+                pick_count(rng, average, len(targets)))
+            if not (model is AuthorSubscription and target_id == owner_id)
+        )
+        created = 0
+        for batch in batched(links, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {created}')
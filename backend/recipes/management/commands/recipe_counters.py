@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверка счетчиков избранного и корзин у рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только показать расхождения, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            fixed = counters.reconcile()
+            self.stdout.write(self.style.SUCCESS(
+                f'Счетчики рецептов исправлены: {fixed}.'))
+            return
+
+        drift = counters.get_drift()
+        for field, rows in drift.items():
+            for recipe_id, stored, actual in rows[:20]:
+                self.stdout.write(
+                    f'Рецепт {recipe_id}, {field}: '
+                    f'сохранено {stored}, фактически {actual}')
+        total = sum(len(rows) for rows in drift.values())
+        if total:
+            raise CommandError(f'Расхождений в счетчиках: {total}.')
+        self.stdout.write(self.style.SUCCESS('Счетчики рецептов согласованы.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes.search import get_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Пересчет поисковых векторов рецептов'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(
+                'Поисковые векторы хранятся только в PostgreSQL, '
+                'в остальных СУБД используется индекс в памяти.')
+            return
+        updated = Recipe.objects.update(search_vector=get_search_vector())
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы пересчитаны, рецептов: {updated}.'))
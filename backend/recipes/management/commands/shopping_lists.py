@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Проверка и пересчет агрегатов списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сравнить агрегаты с корзинами, ничего не меняя.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пакета при вставке строк.')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            shopping_list.rebuild(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересчитаны.'))
+            return
+
+        expected = shopping_list.get_expected_totals()
+        stored = shopping_list.get_stored_totals()
+        mismatched = [
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        ]
+        for user_id, ingredient_id in sorted(mismatched)[:20]:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидалось {expected.get((user_id, ingredient_id), 0)}, '
+                f'сохранено {stored.get((user_id, ingredient_id), 0)}'
+            )
+        if mismatched:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatched)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок согласованы, строк: {len(stored)}.'))
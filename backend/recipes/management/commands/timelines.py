@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes import feed
+from users.models import AuthorSubscription
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='Пересобрать ленту только этого пользователя.')
+        parser.add_argument(
+            '--authors-only', action='store_true',
+            help='Только пересчитать авторов с чтением по запросу '
+                 '(для запуска по расписанию).')
+
+    def handle(self, *args, **options):
+        fanout_on_read = feed.refresh_fanout_on_read_authors()
+        if options['authors_only']:
+            self.stdout.write(self.style.SUCCESS(
+                'Авторов с чтением по запросу: '
+                f'{len(fanout_on_read)}.'))
+            return
+        user_ids = options['users'] or AuthorSubscription.objects.values_list(
+            'subscriber_id', flat=True).distinct().order_by('subscriber_id')
+        count = 0
+        for user_id in user_ids:
+            feed.rebuild_timeline(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано: {count}. Авторов с чтением по запросу: '
+            f'{len(fanout_on_read)}.'))
@@ -1,7 +1,11 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
 
-from users.models import CustomUser
+from users.models import CustomUser, AuthorSubscription
 
 AMOUNT_MIN = 1
 AMOUNT_MAX = 32000
@@ -47,6 +51,77 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class SearchVectorIndex(GinIndex):
+    """ GIN-индекс поискового вектора.
+    В других СУБД создается обычный индекс, чтобы схема
+    оставалась переносимой. """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+
+def get_recipe_prefetches(relations=None):
+    """ Связи рецепта, которые подгружаются отдельными запросами.
+    relations ограничивает их набор. """
+    prefetches = {
+        'tags': 'tags',
+        'ingredients_list': Prefetch(
+            'ingredients_list',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    }
+    return tuple(
+        prefetch for relation, prefetch in prefetches.items()
+        if relations is None or relation in relations)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """ Выборки рецептов для отображения в API. """
+
+    def with_related(self):
+        """ Подгружает автора, теги и ингредиенты фиксированным
+        числом запросов. """
+        return self.select_related('author').prefetch_related(
+            *get_recipe_prefetches())
+
+    def with_user_flags(self, user):
+        """ Аннотирует флаги избранного, списка покупок и подписки
+        на автора для текущего пользователя. """
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(AuthorSubscription.objects.filter(
+                subscriber=user, author=OuterRef('author'))),
+        )
+
+    def latest_for_authors(self, authors, limit=None):
+        """ Последние рецепты каждого из авторов одним запросом.
+        При заданном limit выборка ограничивается оконной функцией. """
+        queryset = self.filter(author__in=authors).only(
+            'id', 'author_id', 'name', 'image', 'image_thumbnail',
+            'cooking_time', 'pub_date')
+        if limit is not None:
+            queryset = queryset.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=F('pub_date').desc(),
+                )
+            ).filter(row_number__lte=limit)
+        return queryset.order_by('author_id', '-pub_date')
+
+
 class Recipe(models.Model):
     """ Модель для рецептов. """
     author = models.ForeignKey(
@@ -59,6 +134,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/', blank=False,
         verbose_name='Фото')
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/thumbnails/', blank=True, editable=False,
+        verbose_name='Миниатюра фото')
+    image_medium = models.ImageField(
+        upload_to='recipes/medium/', blank=True, editable=False,
+        verbose_name='Фото среднего размера')
     text = models.TextField(
         verbose_name='Описание')
     ingredients = models.ManyToManyField(
@@ -79,11 +160,34 @@ class Recipe(models.Model):
         editable=False,
         verbose_name='Дата публикации'
     )
+    search_vector = SearchVectorField(
+        null=True, editable=False,
+        verbose_name='Поисковый вектор')
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='В избранном')
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='В списках покупок')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+            SearchVectorIndex(fields=('search_vector',),
+                              name='recipe_search_vector_idx'),
+            models.Index(fields=('-favorites_count', '-pub_date', '-id'),
+                         name='recipe_favorites_count_idx'),
+            models.Index(fields=('-in_carts_count', '-pub_date', '-id'),
+                         name='recipe_in_carts_count_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -139,6 +243,70 @@ class ShoppingCart(models.Model):
         return (f'{self.recipe} в списке покупок у {self.user}')
 
 
+class ShoppingCartIngredient(models.Model):
+    """ Суммарное количество ингредиента в списке покупок пользователя.
+    Поддерживается при изменении корзины и состава рецептов. """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_ingredients',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(
+        default=0,
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        ordering = ('user',)
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
+
+
+class TimelineEntry(models.Model):
+    """ Рецепт в ленте подписок пользователя.
+    Заполняется при публикации рецептов авторами, у которых
+    не слишком много подписчиков. """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        unique_together = ('user', 'recipe')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        ordering = ('user', '-pub_date')
+        indexes = (
+            models.Index(fields=('user', '-pub_date'),
+                         name='timeline_user_pub_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
 class Favorite(models.Model):
     """
     Модель избранных рецептов пользователей.
@@ -0,0 +1,122 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Value, When
+
+from recipes.cache_versions import RECIPES_VERSION, get_version
+
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.4
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.casefold())
+
+
+def get_search_vector():
+    """ Поисковый вектор: название весомее описания. """
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=settings.SEARCH_CONFIG)
+    )
+
+
+def uses_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+class RecipeSearchIndex:
+    """ Инвертированный индекс рецептов в памяти процесса.
+    Используется вместо tsvector в СУБД без полнотекстового поиска,
+    например в SQLite при тестовых запусках. """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._data = ([], [])
+
+    def _build(self):
+        from recipes.models import Recipe
+
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, name, text in Recipe.objects.values_list(
+                'id', 'name', 'text').iterator():
+            for token in tokenize(name):
+                postings[token][pk] += NAME_WEIGHT
+            for token in tokenize(text):
+                postings[token][pk] += TEXT_WEIGHT
+        tokens = sorted(postings)
+        self._data = (tokens, [dict(postings[token]) for token in tokens])
+
+    def _ensure_fresh(self):
+        version = get_version(RECIPES_VERSION)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version != version:
+                self._build()
+                self._version = version
+
+    def search(self, query):
+        """ Рецепты, содержащие все слова запроса (по началу слова):
+        id рецепта -> ранг. """
+        self._ensure_fresh()
+        tokens, postings = self._data
+        ranks = None
+        for word in tokenize(query):
+            word_ranks = defaultdict(float)
+            for position in range(bisect_left(tokens, word), len(tokens)):
+                if not tokens[position].startswith(word):
+                    break
+                for pk, weight in postings[position].items():
+                    word_ranks[pk] = max(word_ranks[pk], weight)
+            if ranks is None:
+                ranks = dict(word_ranks)
+            else:
+                ranks = {
+                    pk: rank + word_ranks[pk]
+                    for pk, rank in ranks.items() if pk in word_ranks
+                }
+            if not ranks:
+                break
+        return ranks or {}
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """ Отбирает рецепты по запросу и упорядочивает их по рангу. """
+    if uses_postgres(queryset):
+        search_query = SearchQuery(
+            query, config=settings.SEARCH_CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query))
+    else:
+        ranks = recipe_search_index.search(query)
+        if not ranks:
+            return queryset.none()
+        queryset = queryset.filter(pk__in=ranks).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(rank))
+                  for pk, rank in ranks.items()],
+                output_field=FloatField()
+            )
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+
+def update_search_vector(recipe_id):
+    """ Пересчитывает поисковый вектор рецепта (только PostgreSQL). """
+    from recipes.models import Recipe
+
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    if uses_postgres(recipes):
+        recipes.update(search_vector=get_search_vector())
@@ -0,0 +1,161 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import (RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient)
+
+# Пока значение истинно, сигналы корзин и ингредиентов рецептов
+# списки покупок не меняют: см. applied_explicitly().
+explicit_changes = ContextVar('shopping_list_explicit', default=False)
+
+
+@contextmanager
+def applied_explicitly():
+    """ Отключает обновление списков покупок из сигналов.
+    Используется массовыми операциями, которые сами переносят
+    изменения в списки покупок одной пачкой. """
+    token = explicit_changes.set(True)
+    try:
+        yield
+    finally:
+        explicit_changes.reset(token)
+
+
+def get_recipe_amounts(recipe_id):
+    """ Количество каждого ингредиента в рецепте. """
+    return get_recipes_amounts([recipe_id])
+
+
+def get_recipes_amounts(recipe_ids):
+    """ Количество каждого ингредиента в нескольких рецептах вместе. """
+    return Counter(dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    ))
+
+
+def negate(amounts):
+    return {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    }
+
+
+def apply_amounts(user_ids, deltas):
+    """ Прибавляет deltas (ингредиент -> количество) к спискам покупок
+    пользователей. Строки с нулевым количеством удаляются. """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    ShoppingCartIngredient.objects.bulk_create(
+        [
+            ShoppingCartIngredient(user_id=user_id,
+                                   ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+    items = ShoppingCartIngredient.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas)
+    items.update(total_amount=F('total_amount') + Case(
+        *[When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in deltas.items()],
+        default=Value(0)
+    ))
+    items.filter(total_amount__lte=0).delete()
+
+
+def get_cart_user_ids(recipe_id):
+    """ Пользователи, у которых рецепт лежит в корзине. """
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def add_recipe(user_id, recipe_id):
+    """ Добавляет ингредиенты рецепта в список покупок. """
+    add_recipes(user_id, [recipe_id])
+
+
+def remove_recipe(user_id, recipe_id):
+    """ Убирает ингредиенты рецепта из списка покупок. """
+    remove_recipes(user_id, [recipe_id])
+
+
+def add_recipes(user_id, recipe_ids):
+    """ Добавляет ингредиенты нескольких рецептов в список покупок. """
+    apply_amounts([user_id], get_recipes_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """ Убирает ингредиенты нескольких рецептов из списка покупок. """
+    apply_amounts([user_id], negate(get_recipes_amounts(recipe_ids)))
+
+
+def remove_recipe_everywhere(recipe_id):
+    """ Убирает ингредиенты удаляемого рецепта из всех списков покупок. """
+    apply_amounts(get_cart_user_ids(recipe_id),
+                  negate(get_recipe_amounts(recipe_id)))
+
+
+def recipe_amounts_changed(recipe_id, deltas):
+    """ Переносит изменение состава рецепта в списки покупок. """
+    apply_amounts(get_cart_user_ids(recipe_id), deltas)
+
+
+def get_shopping_list(user_id):
+    """ Строки списка покупок пользователя для выгрузки. """
+    return ShoppingCartIngredient.objects.filter(
+        user_id=user_id, total_amount__gt=0
+    ).values('ingredient__name', 'ingredient__measurement_unit',
+             ingredient_amount=F('total_amount'),
+             ).order_by('ingredient__name')
+
+
+def get_expected_totals():
+    """ Списки покупок, вычисленные по корзинам заново:
+    (пользователь, ингредиент) -> количество. """
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in
+        RecipeIngredient.objects.filter(
+            recipe__shopping_recipe__isnull=False
+        ).values_list(
+            'recipe__shopping_recipe__user', 'ingredient_id'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+def get_stored_totals():
+    """ Списки покупок, сохраненные в агрегатной таблице. """
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in
+        ShoppingCartIngredient.objects.filter(total_amount__gt=0)
+        .values_list('user_id', 'ingredient_id', 'total_amount')
+    }
+
+
+def rebuild(batch_size=1000):
+    """ Пересчитывает агрегатную таблицу по корзинам. """
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.all().delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            (
+                ShoppingCartIngredient(user_id=user_id,
+                                       ingredient_id=ingredient_id,
+                                       total_amount=total)
+                for (user_id, ingredient_id), total
+                in get_expected_totals().items()
+            ),
+            batch_size=batch_size
+        )
@@ -0,0 +1,190 @@
+from collections import Counter, defaultdict
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipes import feed, shopping_list
+from recipes.cache_versions import (
+    INGREDIENTS_VERSION, RECIPE_VERSION, RECIPES_VERSION,
+    SHOPPING_CART_VERSION, TAGS_VERSION, USER_VERSION, USERS_VERSION,
+    VIEWER_VERSION, bump_version)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_vector
+from users.models import AuthorSubscription, CustomUser
+
+
+def bump_shopping_carts(recipe_id):
+    """ Обновляет версии корзин всех пользователей с этим рецептом. """
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True)
+    for user_id in user_ids:
+        bump_version(SHOPPING_CART_VERSION, user_id)
+
+
+def bump_recipe(recipe_id):
+    """ Обновляет версии рецепта и таблицы рецептов. """
+    bump_version(RECIPES_VERSION)
+    bump_version(RECIPE_VERSION, recipe_id)
+
+
+def recipe_ingredients_changed(recipe_id):
+    """ Сбрасывает кеши рецепта и списков покупок после изменения
+    его ингредиентов. Для отдельных строк ее вызывают сигналы
+    RecipeIngredient, массовые операции сигналов не отправляют
+    и вызывают функцию явно. """
+    bump_recipe(recipe_id)
+    bump_shopping_carts(recipe_id)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    """ Сбрасывает индекс ингредиентов при их изменении. """
+    bump_version(INGREDIENTS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    """ Обновляет версию справочника тегов. """
+    bump_version(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=CustomUser)
+def user_changed(instance, update_fields=None, **kwargs):
+    """ Обновляет версии профилей пользователей.
+    Обновление только last_login при входе профиль не меняет. """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_version(USERS_VERSION)
+    bump_version(USER_VERSION, instance.pk)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(instance, **kwargs):
+    """ Сбрасывает кеш списка покупок пользователя. """
+    bump_version(SHOPPING_CART_VERSION, instance.user_id)
+    bump_version(VIEWER_VERSION, instance.user_id)
+
+
+def get_saved_values(instance, *fields):
+    """ Значения полей строки в базе до ее сохранения.
+    Для новой строки возвращает None. """
+    if instance._state.adding:
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def shopping_cart_saving(instance, raw, **kwargs):
+    """ Запоминает прежние пользователя и рецепт строки корзины. """
+    if not raw and not shopping_list.explicit_changes.get():
+        instance._saved_values = get_saved_values(
+            instance, 'user_id', 'recipe_id')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_saved(instance, created, raw, **kwargs):
+    """ Переносит добавление рецепта в корзину (в том числе
+    из админки) в список покупок. """
+    saved_values = instance.__dict__.pop('_saved_values', None)
+    if raw or shopping_list.explicit_changes.get():
+        return
+    current = (instance.user_id, instance.recipe_id)
+    if created:
+        shopping_list.add_recipe(*current)
+    elif saved_values is not None and saved_values != current:
+        shopping_list.remove_recipe(*saved_values)
+        shopping_list.add_recipe(*current)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(instance, **kwargs):
+    """ Убирает рецепт из списка покупок при удалении из корзины,
+    в том числе каскадном. Ингредиенты берутся из базы: если строки
+    рецепта уже удалены тем же каскадом, их учел сигнал
+    RecipeIngredient, и повторного вычитания не будет. """
+    if not shopping_list.explicit_changes.get():
+        shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def recipe_ingredient_saving(instance, raw, **kwargs):
+    """ Запоминает прежний состав строки рецепта. """
+    if not raw and not shopping_list.explicit_changes.get():
+        instance._saved_values = get_saved_values(
+            instance, 'recipe_id', 'ingredient_id', 'amount')
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(instance, created, raw, **kwargs):
+    """ Переносит изменение строки рецепта (например, в админке)
+    в списки покупок и сбрасывает кеши рецепта. """
+    saved_values = instance.__dict__.pop('_saved_values', None)
+    if raw or shopping_list.explicit_changes.get():
+        return
+    if not created and saved_values is None:
+        return
+    changes = defaultdict(Counter)
+    if saved_values is not None:
+        recipe_id, ingredient_id, amount = saved_values
+        changes[recipe_id][ingredient_id] -= amount
+    changes[instance.recipe_id][instance.ingredient_id] += instance.amount
+    for recipe_id, deltas in changes.items():
+        if any(deltas.values()):
+            shopping_list.recipe_amounts_changed(recipe_id, deltas)
+            recipe_ingredients_changed(recipe_id)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(instance, **kwargs):
+    """ Убирает удаленную строку рецепта из списков покупок, в том
+    числе при каскадном удалении рецепта или ингредиента, и сбрасывает
+    кеши рецепта. Корзины берутся из базы: если они уже удалены тем же
+    каскадом, ингредиенты из них убрал сигнал ShoppingCart. """
+    if not shopping_list.explicit_changes.get():
+        shopping_list.recipe_amounts_changed(
+            instance.recipe_id, {instance.ingredient_id: -instance.amount})
+        recipe_ingredients_changed(instance.recipe_id)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def favorite_changed(instance, **kwargs):
+    """ Обновляет версию персональных данных пользователя. """
+    bump_version(VIEWER_VERSION, instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=AuthorSubscription)
+def subscription_changed(instance, signal, **kwargs):
+    """ Обновляет версию персональных данных и ленту подписчика. """
+    bump_version(VIEWER_VERSION, instance.subscriber_id)
+    if signal is post_delete:
+        feed.run_after_commit(
+            feed.unsubscribe, instance.subscriber_id, instance.author_id)
+    elif kwargs['created']:
+        feed.run_after_commit(
+            feed.subscribe, instance.subscriber_id, instance.author_id)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, signal, **kwargs):
+    """ Обновляет версии рецепта и поисковый вектор, сбрасывает кеш
+    списков покупок с измененным рецептом. """
+    bump_recipe(instance.pk)
+    if signal is not post_save:
+        return
+    update_fields = kwargs['update_fields']
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_vector(instance.pk)
+    if kwargs['created']:
+        feed.fan_out_recipe(instance)
+    else:
+        bump_shopping_carts(instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, **kwargs):
+    """ Обновляет версии рецепта при изменении его тегов. """
+    if action.startswith('post_') and isinstance(instance, Recipe):
+        bump_recipe(instance.pk)
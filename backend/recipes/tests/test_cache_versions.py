@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from recipes.cache_versions import TAGS_VERSION, bump_version, get_version
+
+
+class BumpVersionTests(TestCase):
+    """ Метка версии меняется только после фиксации транзакции. """
+
+    def setUp(self):
+        cache.clear()
+        self.version = get_version(TAGS_VERSION)
+
+    def test_changed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(TAGS_VERSION)
+            self.assertEqual(get_version(TAGS_VERSION), self.version)
+        self.assertNotEqual(get_version(TAGS_VERSION), self.version)
+
+    def test_unchanged_after_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    bump_version(TAGS_VERSION)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(get_version(TAGS_VERSION), self.version)
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase, override_settings
+
+from recipes.checks import shared_cache_check
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': 'redis://localhost:6379/0'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES=LOCMEM, DEBUG=False)
+    def test_local_cache(self):
+        self.assertEqual([warning.id for warning in shared_cache_check(None)],
+                         ['recipes.W001'])
+
+    @override_settings(CACHES=LOCMEM, DEBUG=True)
+    def test_local_cache_in_debug(self):
+        self.assertEqual(shared_cache_check(None), [])
+
+    @override_settings(CACHES=REDIS, DEBUG=False)
+    def test_shared_cache(self):
+        self.assertEqual(shared_cache_check(None), [])
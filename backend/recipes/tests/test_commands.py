@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import models
+from django.test import TestCase
+
+from recipes import shopping_list
+from recipes.cache_versions import TAGS_VERSION, get_version
+from recipes.management.commands.explain_queries import find_seq_scans
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartIngredient, Tag)
+from users.models import AuthorSubscription, CustomUser
+
+
+class DataIngridientTests(TestCase):
+
+    def setUp(self):
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        with open(os.path.join(data_dir.name, 'ingredients.csv'), 'w',
+                  encoding='utf-8') as csv_file:
+            csv_file.write('соль,г\nсахар,г\n соль , г\nпустая\n')
+        with open(os.path.join(data_dir.name, 'ingredients.json'), 'w',
+                  encoding='utf-8') as json_file:
+            json.dump([{'name': 'сахар', 'measurement_unit': 'г'},
+                       {'name': 'молоко', 'measurement_unit': 'мл'}],
+                      json_file)
+        patcher = mock.patch(
+            'recipes.management.commands.data_ingridient.CSV_FILES_DIR',
+            data_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def import_ingredients(self, **options):
+        stdout = StringIO()
+        call_command('data_ingridient', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_import_is_idempotent(self):
+        output = self.import_ingredients(batch_size=1)
+        self.assertIn('уникальных: 3', output)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('соль', 'г'), ('сахар', 'г'), ('молоко', 'мл')})
+        with self.assertNumQueries(1):
+            output = self.import_ingredients()
+        self.assertIn('добавлено: 0', output)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_dry_run(self):
+        output = self.import_ingredients(dry_run=True)
+        self.assertIn('будет добавлено: 3', output)
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_batch_size_must_be_positive(self):
+        for batch_size in (0, -1):
+            with self.assertRaises(CommandError):
+                self.import_ingredients(batch_size=batch_size)
+        self.assertFalse(Ingredient.objects.exists())
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        CustomUser.objects.create_user(
+            username='user', email='user@example.com',
+            password='Pass-word-1', first_name='Имя', last_name='Фамилия')
+        stdout = StringIO()
+        call_command('explain_queries', stdout=stdout)
+        self.assertIn('Все основные запросы используют индексы.',
+                      stdout.getvalue())
+
+    def test_without_users(self):
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+    def test_find_seq_scans(self):
+        plan = '\n'.join((
+            '3 0 0 SCAN recipes_recipe',
+            '5 0 0 SCAN recipes_tag USING INDEX tag_slug_idx',
+            '7 0 0 SCAN CONSTANT ROW',
+        ))
+        self.assertEqual(find_seq_scans(plan), ['recipes_recipe'])
+
+
+class GenerateDataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (('Мука', 'г'), ('Молоко', 'мл'), ('Яйца', 'шт'),
+                               ('Соль', 'г'), ('Сахар', 'г')))
+
+    def generate(self, **options):
+        call_command('generate_data', stdout=StringIO(), batch_size=7,
+                     **options)
+
+    def test_generate(self):
+        self.generate(users=10, recipes=30, seed=1)
+        self.assertEqual(CustomUser.objects.count(), 10)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(Tag.objects.count(), 3)
+        self.assertTrue(AuthorSubscription.objects.exists())
+        self.assertFalse(AuthorSubscription.objects.filter(
+            subscriber=models.F('author')).exists())
+        for recipe in Recipe.objects.prefetch_related('ingredients_list'):
+            self.assertTrue(recipe.ingredients_list.all())
+        self.assertEqual(shopping_list.get_stored_totals(),
+                         shopping_list.get_expected_totals())
+        self.assertEqual(
+            ShoppingCartIngredient.objects.values('user').distinct().count(),
+            ShoppingCart.objects.values('user').distinct().count())
+        recipe = Recipe.objects.annotate(
+            favorites=models.Count('favoriting')).first()
+        self.assertEqual(recipe.favorites_count, recipe.favorites)
+
+    def test_seed_is_reproducible(self):
+        self.generate(users=5, recipes=10, seed=42, prefix='first')
+        self.generate(users=5, recipes=10, seed=42, prefix='second')
+        first, second = (
+            list(Recipe.objects.filter(
+                author__username__startswith=prefix
+            ).order_by('pk').values_list('name', 'cooking_time'))
+            for prefix in ('first', 'second'))
+        self.assertEqual(first, second)
+        self.assertEqual(
+            Favorite.objects.filter(user__username='first0').count(),
+            Favorite.objects.filter(user__username='second0').count())
+
+    def test_tags_version_bumped(self):
+        version = get_version(TAGS_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.generate(users=1, recipes=1)
+        self.assertNotEqual(get_version(TAGS_VERSION), version)
+
+    def test_prefix_taken(self):
+        self.generate(users=1, recipes=1)
+        with self.assertRaises(CommandError):
+            self.generate(users=1, recipes=1)
+
+    def test_without_ingredients(self):
+        Ingredient.objects.all().delete()
+        with self.assertRaises(CommandError):
+            self.generate(users=1, recipes=1)
@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes import counters
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser
+
+
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='user', email='user@example.com',
+            password='Pass-word-1', first_name='Имя', last_name='Фамилия')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Блины', text='Описание',
+            cooking_time=20, image='recipes/test.png')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_counts(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.favorites_count, self.recipe.in_carts_count
+
+    def test_change_counter(self):
+        counters.change_counter(counters.FAVORITES_COUNT, [self.recipe.pk], 2)
+        self.assertEqual(self.get_counts(), (2, 0))
+        # Счетчик не уходит ниже нуля.
+        counters.change_counter(counters.IN_CARTS_COUNT, [self.recipe.pk], -1)
+        self.assertEqual(self.get_counts(), (2, 0))
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=5, in_carts_count=0)
+        self.assertEqual(counters.get_drift(), {
+            counters.FAVORITES_COUNT: [(self.recipe.pk, 5, 1)],
+            counters.IN_CARTS_COUNT: [(self.recipe.pk, 0, 1)],
+        })
+        self.assertEqual(counters.reconcile(), 1)
+        self.assertEqual(self.get_counts(), (1, 1))
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_command(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        with self.assertRaisesMessage(CommandError, 'Расхождений'):
+            call_command('recipe_counters', check=True, stdout=StringIO())
+        call_command('recipe_counters', stdout=StringIO())
+        call_command('recipe_counters', check=True, stdout=StringIO())
+        self.assertEqual(self.get_counts(), (1, 0))
@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes import shopping_list
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingCartIngredient)
+from users.models import CustomUser
+
+
+class ShoppingListAggregateTests(TestCase):
+    """ Агрегатная таблица списков покупок совпадает с пересчетом
+    по корзинам после любых изменений корзин и рецептов. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin',
+            first_name='Админ', last_name='Админов')
+        cls.first, cls.second = (
+            CustomUser.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                password='Pass-word-1', first_name='Имя',
+                last_name='Фамилия')
+            for username in ('first', 'second'))
+        cls.flour, cls.milk, cls.salt = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Мука', 'Молоко', 'Соль'))
+        cls.pancakes = Recipe.objects.create(
+            author=cls.first, name='Блины', text='Описание',
+            cooking_time=20, image='recipes/test.png')
+        cls.bread = Recipe.objects.create(
+            author=cls.second, name='Хлеб', text='Описание',
+            cooking_time=60, image='recipes/test.png')
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=cls.pancakes, ingredient=cls.flour,
+                             amount=200),
+            RecipeIngredient(recipe=cls.pancakes, ingredient=cls.milk,
+                             amount=300),
+            RecipeIngredient(recipe=cls.bread, ingredient=cls.flour,
+                             amount=500),
+            RecipeIngredient(recipe=cls.bread, ingredient=cls.salt,
+                             amount=10),
+        ])
+        for user in (cls.first, cls.second):
+            for recipe in (cls.pancakes, cls.bread):
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertConsistent(self):
+        self.assertEqual(shopping_list.get_stored_totals(),
+                         shopping_list.get_expected_totals())
+
+    def get_totals(self, user):
+        return dict(ShoppingCartIngredient.objects.filter(
+            user=user, total_amount__gt=0
+        ).values_list('ingredient__name', 'total_amount'))
+
+    def test_cart_rows(self):
+        self.assertEqual(self.get_totals(self.first),
+                         {'Мука': 700, 'Молоко': 300, 'Соль': 10})
+        ShoppingCart.objects.get(user=self.first, recipe=self.bread).delete()
+        self.assertEqual(self.get_totals(self.first),
+                         {'Мука': 200, 'Молоко': 300})
+        cart = ShoppingCart.objects.get(user=self.second, recipe=self.bread)
+        cart.user = self.first
+        cart.save()
+        self.assertEqual(self.get_totals(self.first),
+                         {'Мука': 700, 'Молоко': 300, 'Соль': 10})
+        self.assertEqual(self.get_totals(self.second),
+                         {'Мука': 200, 'Молоко': 300})
+        self.assertConsistent()
+
+    def test_recipe_ingredient_rows(self):
+        row = RecipeIngredient.objects.get(
+            recipe=self.pancakes, ingredient=self.milk)
+        row.amount = 500
+        row.save()
+        row.ingredient = self.salt
+        row.save()
+        RecipeIngredient.objects.create(
+            recipe=self.bread, ingredient=self.milk, amount=50)
+        RecipeIngredient.objects.get(
+            recipe=self.pancakes, ingredient=self.flour).delete()
+        self.assertEqual(self.get_totals(self.first),
+                         {'Мука': 500, 'Молоко': 50, 'Соль': 510})
+        self.assertConsistent()
+
+    def test_cascades(self):
+        self.salt.delete()
+        self.pancakes.delete()
+        self.assertEqual(self.get_totals(self.first), {'Мука': 500})
+        self.assertConsistent()
+        # Вместе с автором удаляется его рецепт во всех корзинах.
+        self.second.delete()
+        self.assertEqual(self.get_totals(self.first), {})
+        self.assertConsistent()
+
+    def test_queryset_delete(self):
+        Recipe.objects.filter(author=self.first).delete()
+        self.assertConsistent()
+        self.assertEqual(self.get_totals(self.second), {'Мука': 500,
+                                                        'Соль': 10})
+
+    def test_admin(self):
+        self.client.force_login(self.admin)
+        row = RecipeIngredient.objects.get(
+            recipe=self.bread, ingredient=self.flour)
+        response = self.client.post(
+            f'/admin/recipes/recipeingredient/{row.pk}/change/',
+            {'recipe': self.bread.pk, 'ingredient': self.flour.pk,
+             'amount': 400})
+        self.assertEqual(response.status_code, 302)
+        cart = ShoppingCart.objects.get(user=self.first, recipe=self.pancakes)
+        response = self.client.post(
+            f'/admin/recipes/shoppingcart/{cart.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post('/admin/recipes/recipe/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [self.bread.pk]})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Recipe.objects.filter(pk=self.bread.pk).exists())
+        self.assertEqual(self.get_totals(self.first), {})
+        self.assertEqual(self.get_totals(self.second),
+                         {'Мука': 200, 'Молоко': 300})
+        self.assertConsistent()
+
+    def test_applied_explicitly(self):
+        with shopping_list.applied_explicitly():
+            ShoppingCart.objects.filter(recipe=self.bread).delete()
+        self.assertEqual(self.get_totals(self.first)['Соль'], 10)
+        shopping_list.rebuild()
+        self.assertConsistent()
+        self.assertNotIn('Соль', self.get_totals(self.first))
+
+    def test_check_command(self):
+        ShoppingCartIngredient.objects.filter(user=self.first).update(
+            total_amount=0)
+        with self.assertRaisesMessage(CommandError, 'Расхождений'):
+            call_command('shopping_lists', check=True, stdout=StringIO())
+        call_command('shopping_lists', stdout=StringIO())
+        call_command('shopping_lists', check=True, stdout=StringIO())
+        self.assertConsistent()
@@ -70,6 +70,10 @@ class AuthorSubscription(models.Model):
 
     class Meta:
         unique_together = ('author', 'subscriber')
+        indexes = (
+            models.Index(fields=('subscriber', 'author'),
+                         name='subscription_subscriber_idx'),
+        )
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписки на авторов'
         ordering = ['-author_id']